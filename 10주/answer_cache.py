@@ -0,0 +1,134 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.runnables import RunnableLambda
+
+from constitution_splitter import article_refs
+
+# 의미 기반 답변 캐시 설정 (환경변수로 덮어쓸 수 있음)
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.93"))  # 이 코사인 유사도 이상이면 같은 질문으로 본다
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", "500"))               # 넘치면 가장 오래 안 쓴 답변부터 버린다
+
+
+def index_version(vectorstore):
+    """벡터스토어 내용이 바뀌면(다시 만들면 문서 id가 새로 생긴다) 달라지는 값."""
+    ids = "\n".join(vectorstore.index_to_docstore_id[i] for i in sorted(vectorstore.index_to_docstore_id))
+    return hashlib.sha256(f"{vectorstore.index.ntotal}\n{ids}".encode("utf-8")).hexdigest()
+
+
+class SemanticAnswerCache:
+    """독립 질문 임베딩이 충분히 비슷한 이전 질문의 답변과 참고 문서를 돌려주는 LRU 캐시.
+
+    "제37조 내용은?"과 "제38조 내용은?"은 임베딩이 거의 같으므로, 질문에 든 조문 번호가 같은 항목끼리만 비교한다.
+    """
+
+    def __init__(self, embeddings, threshold=ANSWER_CACHE_THRESHOLD, max_size=ANSWER_CACHE_SIZE):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_size = max_size
+        self.version = None
+        self._entries = OrderedDict()   # 질문 → {"vector", "refs", "answer", "context", "created"}
+        self._lock = threading.Lock()
+        self.counts = {"lookups": 0, "hits": 0, "evictions": 0, "invalidations": 0}
+
+    def _vector(self, question):
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def ensure_version(self, version):
+        """색인이 바뀌었으면 예전 색인으로 만든 답변을 모두 버린다."""
+        with self._lock:
+            if self.version != version:
+                if self._entries:
+                    self.counts["invalidations"] += 1
+                self._entries.clear()
+                self.version = version
+
+    def lookup(self, question):
+        """가장 비슷한 이전 질문이 임계값 이상이면 (답변, 참고 문서, 유사도), 아니면 None."""
+        vector = self._vector(question)
+        refs = tuple(sorted(article_refs(question)))
+        with self._lock:
+            self.counts["lookups"] += 1
+            keys = [k for k, entry in self._entries.items() if entry["refs"] == refs]
+            if not keys:
+                return None
+            scores = np.stack([self._entries[k]["vector"] for k in keys]) @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            self.counts["hits"] += 1
+            self._entries.move_to_end(keys[best])
+            entry = self._entries[keys[best]]
+            return entry["answer"], entry["context"], float(scores[best])
+
+    def add(self, question, answer, context):
+        vector = self._vector(question)
+        with self._lock:
+            self._entries[question] = {
+                "vector": vector, "refs": tuple(sorted(article_refs(question))),
+                "answer": answer, "context": context, "created": time.time(),
+            }
+            self._entries.move_to_end(question)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.counts["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counts["lookups"]
+            return dict(
+                self.counts, size=len(self._entries),
+                hit_rate=self.counts["hits"] / lookups if lookups else 0.0,
+            )
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_answer_cache(embeddings, model, version):
+    """모델마다 하나인 프로세스 공용 답변 캐시. 색인 버전이 바뀌면 비운다."""
+    with _caches_lock:
+        if model not in _caches:
+            _caches[model] = SemanticAnswerCache(embeddings)
+        cache = _caches[model]
+    cache.ensure_version(version)
+    return cache
+
+
+def answer_cache_stats(model):
+    with _caches_lock:
+        cache = _caches.get(model)
+    if cache is None:
+        return {"lookups": 0, "hits": 0, "evictions": 0, "invalidations": 0, "size": 0, "hit_rate": 0.0}
+    return cache.stats()
+
+
+def with_answer_cache(rag_chain, rewrite_question, cache):
+    """create_retrieval_chain 결과 앞에 답변 캐시를 둔다. 출력 형식(input/context/answer)은 그대로다.
+
+    캐시 적중이면 검색과 답변 생성을 모두 건너뛰고 cached_similarity를 함께 돌려준다.
+    제너레이터라서 stream()으로 부르면 캐시에 없는 답변도 토큰 단위로 흘려보낸다.
+    """
+    def run(inputs):
+        question = rewrite_question(inputs)
+        hit = cache.lookup(question)
+        if hit:
+            answer, context, similarity = hit
+            yield {**inputs, "context": context, "answer": answer, "cached_similarity": similarity}
+            return
+        answer, context = [], []
+        for chunk in rag_chain.stream(inputs):
+            if "context" in chunk:
+                context = chunk["context"]
+            if "answer" in chunk:
+                answer.append(chunk["answer"])
+            yield chunk
+        cache.add(question, "".join(answer), context)
+
+    return RunnableLambda(run).with_config(run_name="cached_retrieval_chain")
@@ -1,22 +1,35 @@
+import logging
 import os
 import pathlib
+import time
 import streamlit as st
 
 from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_openai import ChatOpenAI
 from langchain.vectorstores import FAISS
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
+from langchain.chains import create_retrieval_chain
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_community.chat_message_histories.streamlit import StreamlitChatMessageHistory
 
+from answer_cache import answer_cache_stats, get_answer_cache, index_version, with_answer_cache
+from context_assembler import CONTEXT_CANDIDATES, assembled_retriever, context_stats
+from constitution_splitter import article_retriever, split_articles
+from embedding_backend import get_embeddings
+from faiss_index import INDEX_TYPE, make_vectorstore, tune_index
+from hybrid_retriever import hybrid_retriever
+from query_rewriter import history_aware_retriever, question_rewriter
+
 ###############################################################
 # OpenAI API Key 설정 (환경변수 사용 권장)
 ###############################################################
 os.environ.setdefault("OPENAI_API_KEY", "YOUR_OPENAI_API_KEY")
 
+# 질문마다 컨텍스트 조립 결과(사용 조각 수, 절약한 토큰)를 콘솔에 남긴다
+logging.basicConfig()
+logging.getLogger("context_assembler").setLevel(logging.INFO)
+
 ###############################################################
 # PDF 로드 & 벡터스토어 구축 (FAISS)
 ###############################################################
@@ -24,22 +37,30 @@ os.environ.setdefault("OPENAI_API_KEY", "YOUR_OPENAI_API_KEY")
 @st.cache_resource(show_spinner=False)
 def load_and_split_pdf(file_path: str):
     """PDF 를 로드해 LangChain 문서 리스트로 반환합니다."""
+    # 조문이 페이지 경계에서 잘리지 않도록 페이지 단위로만 읽고 조문 분할은 split_articles에 맡긴다
     loader = PyPDFLoader(file_path)
-    return loader.load_and_split()
+    return loader.load()
 
 
 @st.cache_resource(show_spinner=False)
 def create_vector_store(_docs):
     """문서 리스트를 임베딩 후 FAISS 벡터스토어 생성, 로컬 저장"""
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-    split_docs = text_splitter.split_documents(_docs)
+    # 전문/조문 하나가 한 조각 (긴 조문은 항 단위), metadata에 장·조 번호를 남긴다
+    source = pathlib.Path(_docs[0].metadata.get("source", "")).name if _docs else ""
+    split_docs = split_articles(_docs, source)
 
-    persist_directory = pathlib.Path("./faiss_db")
+    # 조각 방식/임베딩 모델/인덱스 종류마다 따로 저장
+    persist_directory = pathlib.Path("./faiss_db") / "articles" / get_embeddings().name / INDEX_TYPE
     persist_directory.mkdir(parents=True, exist_ok=True)
 
-    vectorstore = FAISS.from_documents(
-        split_docs,
-        OpenAIEmbeddings(model="text-embedding-3-small"),
+    # 조각 수에 따라 flat / IVF-Flat / IVF-PQ 중 자동 선택 (FAISS_INDEX_TYPE으로 지정 가능)
+    embeddings = get_embeddings()
+    texts = [doc.page_content for doc in split_docs]
+    vectorstore = make_vectorstore(
+        texts,
+        embeddings.embed_documents(texts),
+        [doc.metadata for doc in split_docs],
+        embeddings,
     )
     # 디스크에 저장 (index.faiss & index.pkl)
     vectorstore.save_local(str(persist_directory))
@@ -49,15 +70,18 @@ def create_vector_store(_docs):
 @st.cache_resource(show_spinner=False)
 def get_vectorstore(_docs):
     """이미 저장된 FAISS 인덱스가 있으면 불러오고, 없으면 새로 만듭니다."""
-    persist_directory = pathlib.Path("./faiss_db")
+    # 조각 방식/임베딩 모델/인덱스 종류마다 따로 저장
+    persist_directory = pathlib.Path("./faiss_db") / "articles" / get_embeddings().name / INDEX_TYPE
     index_file = persist_directory / "index.faiss"
 
     if index_file.exists():
         try:
-            return FAISS.load_local(
+            vectorstore = FAISS.load_local(
                 str(persist_directory),
-                OpenAIEmbeddings(model="text-embedding-3-small"),
+                get_embeddings(),
             )
+            tune_index(vectorstore.index)
+            return vectorstore
         except Exception:
             # 인덱스 로드 실패 시 새로 생성
             pass
@@ -72,7 +96,11 @@ def initialize_components(selected_model: str):
     file_path = r"../data/대한민국헌법(헌법)(제00010호)(19880225).pdf"
     pages = load_and_split_pdf(file_path)
     vectorstore = get_vectorstore(pages)
-    retriever = vectorstore.as_retriever()
+    # "제37조" 같은 조문 번호/법률 용어는 BM25로, 의미가 비슷한 문장은 벡터 검색으로 찾아 RRF로 합친다
+    # 후보를 넉넉히 찾은 뒤 중복 제거/MMR/문장 압축으로 토큰 예산 안의 컨텍스트만 남긴다
+    candidates = hybrid_retriever(vectorstore, k=CONTEXT_CANDIDATES)
+    # 질문에 "제37조"처럼 조문 번호가 있으면 벡터 검색 없이 그 조문을 바로 꺼낸다
+    retriever = article_retriever(vectorstore, assembled_retriever(candidates, get_embeddings()))
 
     # 채팅 히스토리 요약용 시스템 프롬프트
     contextualize_q_system_prompt = (
@@ -106,12 +134,14 @@ def initialize_components(selected_model: str):
 
     llm = ChatOpenAI(model=selected_model)
 
-    history_aware_retriever = create_history_aware_retriever(
-        llm, retriever, contextualize_q_prompt
-    )
+    # 첫 질문이거나 질문만으로 뜻이 통하면 재작성 LLM 호출을 건너뛰고, 재작성 결과는 캐시한다
+    chat_retriever = history_aware_retriever(llm, retriever, contextualize_q_prompt)
     question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
-    rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
-    return rag_chain
+    rag_chain = create_retrieval_chain(chat_retriever, question_answer_chain)
+
+    # 같은 뜻의 질문이 다시 오면 검색/생성 없이 저장된 답변을 쓴다 (색인을 다시 만들면 캐시는 비워진다)
+    answer_cache = get_answer_cache(get_embeddings(), selected_model, index_version(vectorstore))
+    return with_answer_cache(rag_chain, question_rewriter(llm, contextualize_q_prompt), answer_cache)
 
 ###############################################################
 # Streamlit UI
@@ -131,6 +161,18 @@ conversational_rag_chain = RunnableWithMessageHistory(
     output_messages_key="answer",
 )
 
+stats = answer_cache_stats(option)
+if stats["lookups"]:
+    st.sidebar.caption(
+        f"답변 캐시: 적중 {stats['hits']}/{stats['lookups']} ({stats['hit_rate']:.0%}) · 저장 {stats['size']}개"
+    )
+context = context_stats()
+if context["queries"]:
+    st.sidebar.caption(
+        f"컨텍스트: 질문 {context['queries']}개, 토큰 {context['baseline_tokens']:,} → {context['context_tokens']:,}"
+        f" ({context['saved_tokens']:,} 절약)"
+    )
+
 # 초기 메시지
 if "messages" not in st.session_state:
     st.session_state["messages"] = [
@@ -148,12 +190,30 @@ for msg in chat_history.messages:
 if prompt_message := st.chat_input("Your question"):
     st.chat_message("human").write(prompt_message)
     with st.chat_message("ai"):
-        with st.spinner("Thinking..."):
-            config = {"configurable": {"session_id": "any"}}
-            response = conversational_rag_chain.invoke({"input": prompt_message}, config)
-
-            answer = response["answer"]
-            st.write(answer)
-            with st.expander("참고 문서 확인"):
-                for doc in response["context"]:
-                    st.markdown(doc.metadata.get("source", ""), help=doc.page_content)
+        config = {"configurable": {"session_id": "any"}}
+        answer_box = st.empty()
+        sources_box = st.empty()
+        sources_box.caption("🔎 참고 문서 검색 중...")
+        started = time.perf_counter()
+        timing, cached = {}, {}
+
+        def answer_tokens():
+            # 검색이 끝나 context가 오면 참고 문서부터 보여 주고, 답변은 토큰이 오는 대로 흘려보낸다
+            for chunk in conversational_rag_chain.stream({"input": prompt_message}, config):
+                if "context" in chunk:
+                    with sources_box.container():
+                        with st.expander("참고 문서 확인"):
+                            for doc in chunk["context"]:
+                                st.markdown(doc.metadata.get("source", ""), help=doc.page_content)
+                if "cached_similarity" in chunk:
+                    cached["similarity"] = chunk["cached_similarity"]
+                if chunk.get("answer"):
+                    timing.setdefault("first_token", time.perf_counter() - started)
+                    yield chunk["answer"]
+
+        with answer_box.container():
+            st.write_stream(answer_tokens())
+        if "similarity" in cached:
+            st.caption(f"⚡ 비슷한 이전 질문(유사도 {cached['similarity']:.2f})의 답변을 재사용했습니다.")
+        if "first_token" in timing:
+            st.caption(f"⏱️ 첫 토큰 {timing['first_token']:.2f}초 · 전체 {time.perf_counter() - started:.2f}초")
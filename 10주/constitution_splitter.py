@@ -0,0 +1,131 @@
+import re
+from typing import Any, List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+ARTICLE_MAX_CHARS = 1000    # 이보다 긴 조문은 항(①, ② …) 단위로 나눈다
+
+_CHAPTER_RE = re.compile(r'^\s*(제\s*(\d+)\s*장)\s*(.*)$')
+_SECTION_RE = re.compile(r'^\s*제\s*\d+\s*절\s*\S')
+_ADDENDA_RE = re.compile(r'^\s*부\s*칙')
+# 줄 맨 앞의 "제37조"/"제10조의2" 뒤에 공백, 항 번호, 괄호가 올 때만 조문 시작으로 본다 ("제37조제2항에 따라"는 본문)
+_ARTICLE_RE = re.compile(r'^\s*제\s*(\d+)\s*조(?:\s*의\s*(\d+))?(?=\s|[①-⑳(]|$)')
+_ARTICLE_REF_RE = re.compile(r'제\s*(\d+)\s*조(?:\s*의\s*(\d+))?')
+_CLAUSE_RE = re.compile(r'(?=[①-⑳])')
+_NOISE_RE = re.compile(r'^\s*(법제처.*국가법령정보센터|\d+)\s*$')
+
+
+def article_label(number, sub=None):
+    return f"제{number}조" + (f"의{sub}" if sub else "")
+
+
+def _lines_with_pages(pages):
+    # PyPDFLoader 문서들을 (줄, 페이지) 목록으로 펼치고 머리말/꼬리말 줄은 버린다
+    for page in pages:
+        for line in page.page_content.splitlines():
+            if line.strip() and not _NOISE_RE.match(line):
+                yield line.strip(), page.metadata.get("page")
+
+
+def split_articles(pages, source=""):
+    """헌법 PDF 페이지를 전문/조문 단위 Document로 나눈다. 긴 조문은 항 단위로 더 나눈다.
+
+    metadata: chapter(예: "제2장 국민의 권리와 의무", "제4장 정부 제1절 대통령"), article(예: "제37조"), clause, page, source
+    """
+    sections = []
+    chapter, article, lines, page = "전문", None, [], None
+    last_number = 0
+
+    def flush():
+        if lines:
+            sections.append({"chapter": chapter, "article": article, "text": '\n'.join(lines), "page": page})
+
+    for line, line_page in _lines_with_pages(pages):
+        chapter_match = _CHAPTER_RE.match(line)
+        article_match = _ARTICLE_RE.match(line)
+        if chapter_match and not chapter.startswith("부칙"):
+            flush()
+            chapter, article, lines, page = f"{chapter_match.group(1)} {chapter_match.group(3)}".strip(), None, [], line_page
+            continue
+        if _SECTION_RE.match(line) and not chapter.startswith("부칙"):
+            # "제1절 대통령" 같은 절 제목은 장 이름 뒤에 붙인다
+            flush()
+            chapter, article, lines, page = f"{chapter.split(' 제')[0]} {line}", None, [], line_page
+            continue
+        if _ADDENDA_RE.match(line):
+            flush()
+            # 부칙은 조문 번호가 1부터 다시 시작한다
+            chapter, article, lines, page = line, None, [], line_page
+            last_number = 0
+            continue
+        if article_match and int(article_match.group(1)) > last_number:
+            flush()
+            last_number = int(article_match.group(1))
+            article, lines, page = article_label(article_match.group(1), article_match.group(2)), [], line_page
+        if page is None:
+            page = line_page
+        lines.append(line)
+    flush()
+
+    docs = []
+    for section in sections:
+        text = section["text"]
+        pieces = [text]
+        if len(text) > ARTICLE_MAX_CHARS and section["article"]:
+            pieces = [p.strip() for p in _CLAUSE_RE.split(text) if p.strip()]
+            # ① 앞의 "제37조" 머리는 첫 항에 붙인다
+            if len(pieces) > 1 and not _CLAUSE_RE.match(pieces[0][:1]):
+                pieces[:2] = [f"{pieces[0]} {pieces[1]}"]
+        label = " ".join(filter(None, [source, section["chapter"], section["article"]]))
+        for i, piece in enumerate(pieces):
+            # 항으로 나눈 조각에도 조문 번호를 붙여 검색과 답변 근거 표시에 쓴다
+            if i > 0:
+                piece = f"{section['article']} {piece}"
+            docs.append(Document(
+                page_content=piece,
+                metadata={
+                    "chapter": section["chapter"],
+                    "article": section["article"],
+                    "clause": i + 1 if len(pieces) > 1 else None,
+                    "page": section["page"],
+                    "source": label,
+                },
+            ))
+    return docs
+
+
+def article_refs(query):
+    """질문에 들어 있는 조문 번호 목록. 예: "제37조 제2항" → ["제37조"]."""
+    return list(dict.fromkeys(article_label(m.group(1), m.group(2)) for m in _ARTICLE_REF_RE.finditer(query)))
+
+
+class ArticleLookupRetriever(BaseRetriever):
+    """질문에 조문 번호가 있으면 벡터 검색 없이 그 조문을 바로 돌려주고, 없으면 base 검색기를 쓴다.
+
+    본문 조문만 찾으며 부칙의 같은 번호 조문은 제외한다.
+    """
+
+    base: Any
+    articles: dict
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        found = [doc for ref in article_refs(query) for doc in self.articles.get(ref, [])]
+        if found:
+            return found
+        return self.base.invoke(query)
+
+
+def article_retriever(vectorstore, base):
+    """벡터스토어에 저장된 조문 조각으로 조문 번호 → 조각 목록 표를 만들어 base 검색기 앞에 둔다."""
+    articles = {}
+    for doc in vectorstore.docstore._dict.values():
+        article = doc.metadata.get("article")
+        if article and not str(doc.metadata.get("chapter", "")).startswith("부칙"):
+            articles.setdefault(article, []).append(doc)
+    for docs in articles.values():
+        docs.sort(key=lambda d: d.metadata.get("clause") or 0)
+    return ArticleLookupRetriever(base=base, articles=articles)
@@ -0,0 +1,164 @@
+import logging
+import math
+import re
+import threading
+from typing import Any, List
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from hybrid_retriever import HYBRID_K, tokenize
+
+logger = logging.getLogger(__name__)
+
+# 컨텍스트 조립 설정
+CONTEXT_CANDIDATES = 8          # 검색기에서 받을 후보 조각 수
+CONTEXT_MAX_K = 5               # 프롬프트에 넣을 최대 조각 수 (실제 개수는 점수/예산으로 정해진다)
+CONTEXT_TOKEN_BUDGET = 1200     # 프롬프트에 넣을 참고 문서의 토큰 예산
+CONTEXT_SCORE_MARGIN = 0.1      # 질문과의 코사인 유사도가 최고점보다 이만큼 넘게 낮으면 버린다
+MMR_LAMBDA = 0.7                # 1에 가까울수록 관련도, 0에 가까울수록 다양성 우선
+DEDUP_OVERLAP = 0.8             # 짧은 쪽 토큰의 이 비율 이상이 겹치면 같은 내용으로 본다
+COMPRESS_MIN_TOKENS = 150       # 이보다 짧은 조각은 문장 단위로 줄이지 않는다
+COMPRESS_MIN_OVERLAP = 0.2      # 질문 토큰의 이 비율 이상이 들어 있는 문장만 남긴다
+MIN_TRUNCATED_TOKENS = 50       # 예산이 이보다 적게 남으면 조각을 잘라 넣지 않는다
+CHARS_PER_TOKEN = 1.5           # 한국어 기준 대략적인 글자/토큰 비율
+
+_SENTENCE_RE = re.compile(r'(?<=[.?!])\s+|\n+|(?=[①-⑳])')
+
+
+def estimate_tokens(text):
+    """tiktoken 없이 쓰는 대략적인 토큰 수 추정."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _overlap(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def dedup(docs):
+    """앞선 조각과 내용이 거의 겹치는 조각(중복 페이지, 겹쳐 자른 조각)을 버린다. 검색 순서는 유지한다."""
+    kept, token_sets = [], []
+    for doc in docs:
+        tokens = set(tokenize(doc.page_content))
+        if any(_overlap(tokens, seen) >= DEDUP_OVERLAP for seen in token_sets):
+            continue
+        kept.append(doc)
+        token_sets.append(tokens)
+    return kept
+
+
+def select_mmr(query_vector, doc_vectors, max_k=CONTEXT_MAX_K, margin=CONTEXT_SCORE_MARGIN, lambda_mult=MMR_LAMBDA):
+    """점수 컷오프를 넘는 후보 중 MMR로 고른 인덱스 목록. 검색 1위 조각은 항상 먼저 넣는다."""
+    scores = doc_vectors @ query_vector
+    candidates = [i for i in range(len(scores)) if scores[i] >= scores.max() - margin and i != 0]
+    selected = [0]
+    while candidates and len(selected) < max_k:
+        redundancy = (doc_vectors[candidates] @ doc_vectors[selected].T).max(axis=1)
+        mmr = lambda_mult * scores[candidates] - (1 - lambda_mult) * redundancy
+        selected.append(candidates.pop(int(np.argmax(mmr))))
+    return selected
+
+
+def compress(text, query_tokens):
+    """질문과 겹치는 문장만 남긴다. 첫 문장(조문 번호, 제목)은 늘 남기고 겹치는 문장이 없으면 그대로 둔다."""
+    if estimate_tokens(text) <= COMPRESS_MIN_TOKENS:
+        return text
+    sentences = [s.strip() for s in _SENTENCE_RE.split(text) if s and s.strip()]
+    needed = max(1, math.ceil(len(query_tokens) * COMPRESS_MIN_OVERLAP))
+    keep = [i for i, s in enumerate(sentences) if i > 0 and len(query_tokens & set(tokenize(s))) >= needed]
+    if not keep:
+        return text
+    return "\n".join(sentences[i] for i in [0] + keep)
+
+
+def _normalize(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+class ContextStats:
+    """질문별 조립 결과를 모아 둔다. 토큰 절약량은 예전처럼 상위 HYBRID_K 조각을 통째로 넣었을 때와 비교한다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.baseline_tokens = 0
+        self.context_tokens = 0
+
+    def record(self, baseline, used):
+        with self._lock:
+            self.queries += 1
+            self.baseline_tokens += baseline
+            self.context_tokens += used
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "baseline_tokens": self.baseline_tokens,
+                "context_tokens": self.context_tokens,
+                "saved_tokens": self.baseline_tokens - self.context_tokens,
+            }
+
+
+_context_stats = ContextStats()
+
+
+def context_stats():
+    return _context_stats.stats()
+
+
+class ContextAssemblingRetriever(BaseRetriever):
+    """검색 후보를 중복 제거 → 점수 컷오프 → MMR → 문장 압축 순으로 줄여 토큰 예산 안에서 돌려주는 검색기."""
+
+    base: Any
+    embeddings: Any
+    token_budget: int = CONTEXT_TOKEN_BUDGET
+    max_k: int = CONTEXT_MAX_K
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        candidates = self.base.invoke(query)
+        if not candidates:
+            return []
+        baseline = sum(estimate_tokens(doc.page_content) for doc in candidates[:HYBRID_K])
+        docs = dedup(candidates)
+        # 조각 벡터는 색인을 만들 때 임베딩 캐시에 들어가 있으므로 다시 임베딩하지 않는다
+        query_vector = _normalize(self.embeddings.embed_query(query))
+        doc_vectors = _normalize(self.embeddings.embed_documents([doc.page_content for doc in docs]))
+        order = select_mmr(query_vector, doc_vectors, self.max_k)
+
+        query_tokens = set(tokenize(query))
+        assembled, used = [], 0
+        for i in order:
+            doc = docs[i]
+            text = compress(doc.page_content, query_tokens)
+            tokens = estimate_tokens(text)
+            remaining = self.token_budget - used
+            if tokens > remaining:
+                if assembled and remaining < MIN_TRUNCATED_TOKENS:
+                    break
+                text = text[:int(remaining * CHARS_PER_TOKEN)]
+                tokens = estimate_tokens(text)
+            assembled.append(Document(page_content=text, metadata=dict(doc.metadata)))
+            used += tokens
+            if used >= self.token_budget:
+                break
+
+        _context_stats.record(baseline, used)
+        logger.info(
+            "context: 후보 %d개 → 중복 제거 %d개 → 사용 %d개, 토큰 %d → %d (%d 절약) | %s",
+            len(candidates), len(docs), len(assembled), baseline, used, baseline - used, query[:50],
+        )
+        return assembled
+
+
+def assembled_retriever(base, embeddings, token_budget=CONTEXT_TOKEN_BUDGET):
+    """base는 후보를 넉넉히(CONTEXT_CANDIDATES개) 돌려주는 검색기여야 한다."""
+    return ContextAssemblingRetriever(base=base, embeddings=embeddings, token_budget=token_budget)
@@ -0,0 +1,91 @@
+import math
+import os
+
+import faiss
+import numpy as np
+
+# FAISS 인덱스 설정 (환경변수로 덮어쓸 수 있음)
+INDEX_TYPE = os.environ.get("FAISS_INDEX_TYPE", "auto")    # auto, flat, ivf_flat, ivf_pq, hnsw
+FLAT_MAX_VECTORS = 10_000       # auto: 이보다 적으면 정확한 flat 검색
+IVF_FLAT_MAX_VECTORS = 100_000  # auto: 이보다 적으면 IVF-Flat, 많으면 메모리를 줄이는 IVF-PQ
+IVF_NPROBE = 16                 # 검색할 때 살펴볼 클러스터 수
+IVF_MIN_POINTS_PER_LIST = 39    # FAISS 학습에 필요한 클러스터당 최소 벡터 수
+PQ_BITS = 8
+PQ_MAX_SUBVECTORS = 64
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+
+def choose_index_type(n_vectors, index_type=INDEX_TYPE):
+    """auto면 벡터 수로 고르고, 학습 데이터가 모자란 IVF 계열은 한 단계 단순한 인덱스로 내린다."""
+    if index_type == "auto":
+        if n_vectors < FLAT_MAX_VECTORS:
+            index_type = "flat"
+        elif n_vectors < IVF_FLAT_MAX_VECTORS:
+            index_type = "ivf_flat"
+        else:
+            index_type = "ivf_pq"
+    if index_type == "ivf_pq" and n_vectors < IVF_MIN_POINTS_PER_LIST * 2 ** PQ_BITS:
+        index_type = "ivf_flat"
+    if index_type == "ivf_flat" and n_vectors < IVF_MIN_POINTS_PER_LIST * 4:
+        index_type = "flat"
+    return index_type
+
+
+def _nlist(n_vectors):
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // IVF_MIN_POINTS_PER_LIST))
+
+
+def _pq_subvectors(dim):
+    # 차원을 나눠떨어지게 하는 가장 큰 서브벡터 수
+    return max(m for m in range(1, min(dim, PQ_MAX_SUBVECTORS) + 1) if dim % m == 0)
+
+
+def tune_index(index):
+    """검색 시점 파라미터(nprobe, efSearch)를 맞춘다. 디스크에서 읽은 인덱스에도 쓴다."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(IVF_NPROBE, ivf.nlist)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    return index
+
+
+def build_index(vectors, index_type=INDEX_TYPE):
+    """vectors(float32 행렬)로 학습까지 마친 빈 인덱스를 만든다. 벡터 추가는 호출한 쪽에서 한다."""
+    n_vectors, dim = vectors.shape
+    index_type = choose_index_type(n_vectors, index_type)
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, _nlist(n_vectors))
+    elif index_type == "ivf_pq":
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, _nlist(n_vectors), _pq_subvectors(dim), PQ_BITS)
+    else:
+        raise ValueError(f"알 수 없는 인덱스 종류: {index_type} (가능: {', '.join(INDEX_TYPES)})")
+    if not index.is_trained:
+        index.train(vectors)
+    return tune_index(index)
+
+
+def make_vectorstore(texts, vectors, metadatas, embedding, index_type=INDEX_TYPE):
+    """이미 구한 벡터로 설정한 종류의 인덱스를 만든 LangChain FAISS 벡터스토어."""
+    # index_benchmark.py는 LangChain 없이 이 모듈을 쓰므로 여기서 불러온다
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    vectorstore = FAISS(
+        embedding_function=embedding,
+        index=build_index(matrix, index_type),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+    )
+    vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
+    return vectorstore
@@ -0,0 +1,111 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+
+# 질문 재작성 설정
+REWRITE_CACHE_SIZE = 512        # (대화 요약, 질문) → 재작성 결과를 기억할 개수
+SELF_CONTAINED_MIN_CHARS = 8    # 이보다 짧은 질문("왜요?", "더 자세히")은 앞 대화에 기대는 것으로 본다
+
+# 앞 대화를 가리키는 말: 그것/이건/그럼/그 조항/방금/아까 … , it/that/they …
+_REFERENCE_RE = re.compile(
+    r'(^|\s)(그|이|저)(것|건|게|거|걸|런|렇|래|럼|러면|때|분|곳|중|\s)'
+    r'|(^|\s)(위의|위에서|앞의|앞에서|앞서|해당|방금|아까|거기|여기|또|더|계속|나머지|마찬가지)'
+    r'|\b(it|its|that|this|these|those|they|them|he|she)\b',
+    re.IGNORECASE,
+)
+
+
+def is_self_contained(question):
+    """앞 대화 없이도 뜻이 통하는 질문인지 간단한 규칙으로 판단한다. 애매하면 False(재작성)."""
+    text = question.strip()
+    if len(text) < SELF_CONTAINED_MIN_CHARS:
+        return False
+    return not _REFERENCE_RE.search(text)
+
+
+def history_digest(messages):
+    """대화 기록 전체의 SHA-256. 같은 대화 뒤의 같은 질문이면 재작성 결과를 재사용한다."""
+    digest = hashlib.sha256()
+    for message in messages:
+        digest.update(f"{message.type}\x00{message.content}\x01".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class RewriteCache:
+    """재작성 결과 LRU 캐시와 호출 통계. 세션/체인이 새로 만들어져도 프로세스 안에서 공유한다."""
+
+    def __init__(self, max_size=REWRITE_CACHE_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts = {"no_history": 0, "self_contained": 0, "cache_hit": 0, "llm": 0}
+
+    def count(self, reason):
+        with self._lock:
+            self.counts[reason] += 1
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            self.counts["cache_hit"] += 1
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = sum(self.counts.values())
+            return dict(self.counts, total=total, llm_saved=total - self.counts["llm"])
+
+
+_rewrite_cache = RewriteCache()
+
+
+def rewrite_stats():
+    return _rewrite_cache.stats()
+
+
+def question_rewriter(llm, prompt, history_key="history", cache=None):
+    """{"input", history_key} 입력을 대화 기록 없이도 뜻이 통하는 질문으로 바꾸는 함수. LLM은 꼭 필요할 때만 부른다.
+
+    - 대화 기록이 비었거나 질문이 그 자체로 완결되면 질문을 그대로 돌려준다.
+    - 재작성한 결과는 (대화 기록 해시, 질문)을 키로 캐시한다.
+    """
+    cache = cache or _rewrite_cache
+    rewrite_chain = prompt | llm | StrOutputParser()
+
+    def standalone_question(inputs):
+        question = inputs["input"]
+        history = inputs.get(history_key) or []
+        if not history:
+            cache.count("no_history")
+            return question
+        if is_self_contained(question):
+            cache.count("self_contained")
+            return question
+        key = (history_digest(history), question)
+        rewritten = cache.get(key)
+        if rewritten is None:
+            cache.count("llm")
+            rewritten = rewrite_chain.invoke(inputs)
+            cache.put(key, rewritten)
+        return rewritten
+
+    return standalone_question
+
+
+def history_aware_retriever(llm, retriever, prompt, history_key="history", cache=None):
+    """create_history_aware_retriever 대신 쓰는 검색기. question_rewriter로 만든 질문으로 검색한다."""
+    rewrite = question_rewriter(llm, prompt, history_key, cache)
+    return (RunnableLambda(rewrite) | retriever).with_config(run_name="chat_retriever_chain")
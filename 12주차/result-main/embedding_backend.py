@@ -0,0 +1,143 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# 임베딩 백엔드 설정 (환경변수로 덮어쓸 수 있음)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "openai")   # "openai" 또는 "local"(CPU sentence-transformers)
+OPENAI_EMBEDDING_MODEL = os.environ.get("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+LOCAL_EMBEDDING_MODEL = os.environ.get(
+    "LOCAL_EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+)
+EMBED_BATCH_SIZE = {"openai": 512, "local": 64}    # 한 번에 임베딩할 조각 수 (API는 크게, CPU 모델은 작게)
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", os.path.join(".cache", "embeddings.sqlite3"))
+QUERY_CACHE_SIZE = 256      # 한 질문을 검색/답변 캐시/컨텍스트 조립에서 여러 번 임베딩하지 않도록 메모리에만 잠깐 둔다
+
+
+def text_digest(text):
+    """조각 내용의 SHA-256. 어느 파일에서 왔든 같은 내용이면 같은 키가 된다."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LocalEmbeddings(Embeddings):
+    """네트워크 없이 CPU에서 도는 sentence-transformers 임베딩."""
+
+    def __init__(self, model_name=LOCAL_EMBEDDING_MODEL, batch_size=EMBED_BATCH_SIZE["local"]):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.batch_size = batch_size
+
+    def embed_documents(self, texts):
+        # CachedEmbeddings가 batch_size개씩 잘라 넘기고, encode는 그 안에서 길이순으로 묶어 패딩을 줄인다
+        vectors = self.model.encode(
+            list(texts), batch_size=self.batch_size, normalize_embeddings=True,
+            convert_to_numpy=True, show_progress_bar=False
+        )
+        return vectors.astype(np.float32).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """내용 해시를 키로 조각 벡터를 SQLite에 저장해, 한 번 임베딩한 조각은 다시 임베딩하지 않는다."""
+
+    def __init__(self, base, name, batch_size, path=EMBEDDING_CACHE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.base = base
+        self.name = name        # 모델이 다르면 벡터가 섞이지 않도록 키에 붙인다
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._queries = OrderedDict()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (model TEXT, digest TEXT, vector BLOB, PRIMARY KEY (model, digest))"
+        )
+        self._conn.commit()
+
+    def _load(self, digests):
+        found = {}
+        with self._lock:
+            for start in range(0, len(digests), 500):
+                part = digests[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT digest, vector FROM vectors WHERE model = ? AND digest IN ({','.join('?' * len(part))})",
+                    [self.name] + part
+                ).fetchall()
+                found.update((d, np.frombuffer(v, dtype=np.float32).tolist()) for d, v in rows)
+        return found
+
+    def _save(self, pairs):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors VALUES (?, ?, ?)",
+                [(self.name, d, np.asarray(v, dtype=np.float32).tobytes()) for d, v in pairs]
+            )
+            self._conn.commit()
+
+    def embed_documents(self, texts):
+        digests = [text_digest(t) for t in texts]
+        found = self._load(list(set(digests)))
+        # 캐시에 없는 조각만, 같은 내용은 한 번만 배치로 임베딩한다
+        missing = {}
+        for digest, text in zip(digests, texts):
+            if digest not in found:
+                missing.setdefault(digest, text)
+        self.hits += len(texts) - sum(1 for d in digests if d in missing)
+        self.misses += len(missing)
+        items = list(missing.items())
+        for start in range(0, len(items), self.batch_size):
+            batch = items[start:start + self.batch_size]
+            vectors = self.base.embed_documents([text for _, text in batch])
+            pairs = [(digest, vector) for (digest, _), vector in zip(batch, vectors)]
+            self._save(pairs)
+            found.update(pairs)
+        return [found[d] for d in digests]
+
+    def embed_query(self, text):
+        # 사용자 질문은 조각 풀(SQLite)에 넣지 않고 크기가 정해진 메모리 LRU에만 둔다.
+        # 풀이 질문으로 끝없이 커지거나 index_benchmark.py --from-cache에 질문 벡터가 섞이지 않게 한다
+        with self._lock:
+            if text in self._queries:
+                self._queries.move_to_end(text)
+                return self._queries[text]
+        vector = self.base.embed_query(text)
+        with self._lock:
+            self._queries[text] = vector
+            while len(self._queries) > QUERY_CACHE_SIZE:
+                self._queries.popitem(last=False)
+        return vector
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+_embeddings = {}
+_embeddings_lock = threading.Lock()
+
+
+def embedding_name(backend=EMBEDDING_BACKEND):
+    """임베딩 캐시와 FAISS 저장 경로에서 모델을 구분하는 이름. 모델을 불러오지 않고 설정만으로 정한다."""
+    model = LOCAL_EMBEDDING_MODEL if backend == "local" else OPENAI_EMBEDDING_MODEL
+    return f"{backend}-{model}".replace("/", "_")
+
+
+def get_embeddings(backend=EMBEDDING_BACKEND):
+    """설정한 백엔드의 캐시된 임베딩 모델. 프로세스마다 백엔드별로 하나만 만든다."""
+    with _embeddings_lock:
+        if backend not in _embeddings:
+            if backend == "local":
+                base = LocalEmbeddings()
+            else:
+                from langchain_openai import OpenAIEmbeddings
+                base = OpenAIEmbeddings(model=OPENAI_EMBEDDING_MODEL)
+            _embeddings[backend] = CachedEmbeddings(base, embedding_name(backend), EMBED_BATCH_SIZE.get(backend, 64))
+        return _embeddings[backend]
@@ -0,0 +1,97 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+# 하이브리드 검색 설정
+HYBRID_K = 3            # 최종으로 넘길 문서 수 (정확한 용어가 잡히므로 기본 4보다 작게)
+HYBRID_FETCH_K = 20     # BM25/벡터 검색에서 각각 가져올 후보 수
+RRF_K = 60              # reciprocal rank fusion 상수
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_ARTICLE_RE = re.compile(r'제\s*(\d+)\s*조(?:\s*의\s*(\d+))?')
+_WORD_RE = re.compile(r'[가-힣]+|[a-zA-Z]+|\d+')
+
+
+def tokenize(text):
+    """한글은 글자 2-gram, 영문/숫자는 단어 단위. '제37조', '제10조의2' 같은 조문 번호는 한 토큰으로 둔다."""
+    tokens = [
+        f"제{m.group(1)}조" + (f"의{m.group(2)}" if m.group(2) else "") for m in _ARTICLE_RE.finditer(text)
+    ]
+    for word in _WORD_RE.findall(text.lower()):
+        if len(word) > 1 and '가' <= word[0] <= '힣':
+            tokens.extend(word[i:i+2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+class BM25Index:
+    """문서 조각 목록에 대한 BM25 역색인."""
+
+    def __init__(self, docs):
+        self.docs = list(docs)
+        self.postings = defaultdict(list)
+        self.lengths = []
+        for i, doc in enumerate(self.docs):
+            counts = Counter(tokenize(doc.page_content))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((i, tf))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+    def search(self, query, k=HYBRID_FETCH_K):
+        """점수 높은 순의 (점수, 문서) 목록."""
+        n = len(self.docs)
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / self.avg_length)
+                scores[i] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(score, self.docs[i]) for i, score in ranked]
+
+
+def bm25_from_vectorstore(vectorstore):
+    """FAISS 벡터스토어에 들어 있는 조각들로 BM25 색인을 만든다."""
+    return BM25Index(vectorstore.docstore._dict.values())
+
+
+class HybridRetriever(BaseRetriever):
+    """BM25와 FAISS 결과를 reciprocal rank fusion으로 합치는 검색기."""
+
+    vectorstore: Any
+    bm25: Any
+    k: int = HYBRID_K
+    fetch_k: int = HYBRID_FETCH_K
+    rrf_k: int = RRF_K
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        fused = defaultdict(float)
+        docs = {}
+        rankings = [
+            self.vectorstore.similarity_search(query, k=self.fetch_k),
+            [doc for _, doc in self.bm25.search(query, k=self.fetch_k)],
+        ]
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking):
+                key = (doc.page_content, doc.metadata.get("source"), doc.metadata.get("page"))
+                docs[key] = doc
+                fused[key] += 1 / (self.rrf_k + rank + 1)
+        best = sorted(fused, key=fused.get, reverse=True)[:self.k]
+        return [docs[key] for key in best]
+
+
+def hybrid_retriever(vectorstore, k=HYBRID_K):
+    return HybridRetriever(vectorstore=vectorstore, bm25=bm25_from_vectorstore(vectorstore), k=k)
@@ -0,0 +1,110 @@
+"""FAISS 인덱스 종류별 recall@k(flat 기준), 질의 지연 시간, 크기를 비교한다.
+
+    python index_benchmark.py --vectors 200000 --dim 384
+    python index_benchmark.py --from-cache .cache/embeddings.sqlite3 --queries 300
+
+--from-cache를 주면 embedding_backend가 쌓아 둔 실제 조각 벡터를, 아니면 군집이 있는 합성 벡터를 쓴다.
+캐시에는 여러 임베딩 모델의 벡터가 섞여 있을 수 있으므로 --model(기본: 현재 설정한 모델)의 벡터만 읽는다.
+"""
+import argparse
+import sqlite3
+import time
+
+import faiss
+import numpy as np
+
+from embedding_backend import embedding_name
+from faiss_index import INDEX_TYPES, build_index, choose_index_type
+
+
+def synthetic_vectors(n_vectors, dim, clusters=256, seed=0):
+    # 임베딩처럼 주제별로 뭉친 분포를 흉내 낸다
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n_vectors)
+    vectors = centers[labels] + 0.3 * rng.normal(size=(n_vectors, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def cached_vectors(path, model, limit=None):
+    # 모델마다 차원이 달라 섞이면 np.stack이 실패하고, 차원이 같아도 다른 공간의 벡터라 결과가 틀어진다
+    conn = sqlite3.connect(path)
+    query = "SELECT vector FROM vectors WHERE model = ?" + (f" LIMIT {int(limit)}" if limit else "")
+    rows = conn.execute(query, (model,)).fetchall()
+    conn.close()
+    if not rows:
+        return None
+    return np.stack([np.frombuffer(v, dtype=np.float32) for (v,) in rows])
+
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def measure(index_type, vectors, queries, truth, k):
+    start = time.perf_counter()
+    index = build_index(vectors, index_type)
+    index.add(vectors)
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        found.append(ids[0])
+    latencies.sort()
+    # FAISS 인덱스는 직렬화한 크기와 메모리에 올린 크기가 거의 같다
+    size = faiss.serialize_index(index).nbytes
+    return {
+        "type": choose_index_type(len(vectors), index_type),
+        "recall": recall_at_k(found, truth),
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "build_s": build_seconds,
+        "size_mb": size / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS 인덱스 종류별 recall/지연 시간/크기를 비교합니다.")
+    parser.add_argument("--vectors", type=int, default=50_000, help="합성 벡터 수")
+    parser.add_argument("--dim", type=int, default=384, help="합성 벡터 차원")
+    parser.add_argument("--from-cache", help="embedding_backend 캐시(SQLite)에서 실제 벡터를 읽음")
+    parser.add_argument("--model", default=embedding_name(), help="--from-cache에서 읽을 임베딩 모델 이름 (캐시의 model 열)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.from_cache:
+        vectors = cached_vectors(args.from_cache, args.model, args.vectors)
+        if vectors is None:
+            parser.error(f"{args.from_cache}에 {args.model} 모델의 벡터가 없습니다. --model을 확인하세요.")
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dim, seed=args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    # 질의는 저장된 벡터에 잡음을 섞어 만든다
+    queries = vectors[rng.integers(0, len(vectors), size=args.queries)]
+    queries = (queries + 0.05 * rng.normal(size=queries.shape)).astype(np.float32)
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"벡터 {len(vectors)}개 × {vectors.shape[1]}차원, 질의 {len(queries)}개, k={args.k}"
+          f" (auto 선택: {choose_index_type(len(vectors))})\n")
+    print(f"{'index':<10}{'built as':<10}{'recall@k':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'build(s)':>10}{'size(MB)':>10}")
+    for index_type in args.types:
+        row = measure(index_type, vectors, queries, truth, args.k)
+        print(
+            f"{index_type:<10}{row['type']:<10}{row['recall']:>10.3f}{row['p50_ms']:>10.3f}"
+            f"{row['p95_ms']:>10.3f}{row['build_s']:>10.2f}{row['size_mb']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
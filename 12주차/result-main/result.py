@@ -1,21 +1,29 @@
-import os
+import logging
 import tempfile
+import time
 import hashlib
 import streamlit as st
 from dotenv import load_dotenv
 
 from langchain.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
+from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_community.chat_message_histories.streamlit import StreamlitChatMessageHistory
 
+from context_assembler import CONTEXT_CANDIDATES, assembled_retriever
+from embedding_backend import get_embeddings, text_digest
+from faiss_index import make_vectorstore
+from hybrid_retriever import hybrid_retriever
+from query_rewriter import history_aware_retriever
+
 # 🔐 OpenAI API Key 설정
 load_dotenv()
+logging.basicConfig()
+logging.getLogger("context_assembler").setLevel(logging.INFO) #질문마다 컨텍스트 조립 결과(사용 조각 수, 절약한 토큰)를 콘솔에 출력
 
 # Streamlit UI 구성
 st.set_page_config(page_title="파일 업로드 + 헌법 Q&A 챗봇", layout="centered") #st.set_page_config() :앱의 제목, 아이콘, 레이아웃, 초기 사이드바 상태 등을 설정하는 데 사용. 
@@ -48,30 +56,43 @@ def load_and_split_pdf(file) -> list:
     loader = PyPDFLoader(tmp_file_path)
     return loader.load_and_split()
 
-# ✅ FAISS 저장/로드 통합 함수
+# ✅ 조각 단위 FAISS 구성 함수
 @st.cache_resource  #캐시된 내용을 재사용
-def load_or_create_vectorstore(_docs, file_hash):  #임베딩 벡터db가 있으면 불러오고 없으면 생성.
-    index_path = os.path.join("faiss_index", file_hash) #저장된 벡터 인덱스가 위치할 경로.
-    embedding_model = OpenAIEmbeddings(model="text-embedding-3-small") #텍스트 임베딩 모델 로딩.
-
-    if os.path.exists(index_path):   #벡터 인덱스가 이미 존재한다면면
-        return FAISS.load_local(index_path, embedding_model) #저장된 벡터 인덱스 불러오기 재사용으로 인해 시간절약(faiss는 무조건 필요)
+def load_or_create_vectorstore(_docs, file_hash):  #문서 조각의 벡터를 공유 벡터 풀에서 가져와 FAISS 인덱스를 구성.
+    embedding_model = get_embeddings() #EMBEDDING_BACKEND 환경변수로 openai/local(CPU) 선택.
+    #벡터 풀 = embedding_backend의 디스크 캐시. 조각 내용의 해시가 키라서 어느 문서에서 왔든 같은 조각은 한 번만 저장/임베딩됨.
+    #그래서 한 페이지만 고친 문서나 다시 내보낸 같은 문서를 올려도 바뀐 조각만 새로 임베딩한다.(파일 전체 해시마다 인덱스를 통째로 저장하지 않음)
 
-    # 없다면 새로 생성
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=0) #임베딩을 위해 쪼개준다.(겹치는 부분 없이)
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=0) #임베딩을 위해 쪼개준다.(겹치는 부분 없이, 페이지별로 나뉘므로 한 페이지를 고쳐도 다른 페이지 조각은 그대로)
     split_docs = text_splitter.split_documents(_docs) #위에서 정한 기준으로 분할 후 리스트 생성
+    unique_docs, seen = [], set()
     for doc in split_docs:
+        digest = text_digest(doc.page_content) #조각 내용 해시
+        if digest in seen: #머리말/꼬리말처럼 문서 안에서 똑같이 반복되는 조각은 하나만 색인
+            continue
+        seen.add(digest)
         doc.metadata["source"] = f"{doc.metadata.get('source', '업로드 파일')} (p.{doc.metadata.get('page', 'n/a')})" #문서의 출처 정보를 명확히 하기 위해 metadata["source"] 필드를 업데이트
-    vectorstore = FAISS.from_documents(split_docs, embedding_model) #문서 조각들과 임베딩 모델을 사용하여 FAISS 벡터 DB를 생성(FAISS는 빠르고 효율적인 벡터 검색 라이브러리
-
-    os.makedirs("faiss_index", exist_ok=True) #"faiss_index" 폴더가 없으면 생성(있으면 아무 일도 일어나지 않게 exist_ok = True)
-    vectorstore.save_local(index_path) #위에서 만든 벡터 인덱스를 로컬 경로에 저장.(다음을 위해 캐시 파일로 유지)
+        doc.metadata["chunk_hash"] = digest
+        unique_docs.append(doc)
+
+    before = embedding_model.stats()
+    texts = [doc.page_content for doc in unique_docs]
+    vectors = embedding_model.embed_documents(texts) #풀에 있는 조각은 그대로 꺼내고, 없는 조각만 배치로 임베딩
+    after = embedding_model.stats()
+    vectorstore = make_vectorstore( #이미 구한 벡터로 바로 인덱스 생성(임베딩 호출 없음). 조각 수에 따라 flat/IVF/PQ 자동 선택(FAISS_INDEX_TYPE로 지정 가능)
+        texts,
+        vectors,
+        [doc.metadata for doc in unique_docs],
+        embedding_model,
+    )
+    st.caption(f"🧩 조각 {len(texts)}개 중 {after['misses'] - before['misses']}개만 새로 임베딩했습니다. (나머지는 벡터 풀에서 재사용)")
     return vectorstore#벡터 저장소(faiss)불러오기
 
 # ✅ RAG 체인 구성
 def initialize_rag_chain(docs, file_hash, selected_model):
     vectorstore = load_or_create_vectorstore(docs, file_hash)
-    retriever = vectorstore.as_retriever()
+    candidates = hybrid_retriever(vectorstore, k=CONTEXT_CANDIDATES) #BM25(글자 2-gram, 조문 번호) + 벡터 검색을 RRF로 합친 하이브리드 검색으로 후보를 넉넉히 찾음
+    retriever = assembled_retriever(candidates, get_embeddings()) #중복 제거, 점수 컷오프, MMR, 문장 압축으로 토큰 예산(CONTEXT_TOKEN_BUDGET) 안의 컨텍스트만 남김
 
     contextualize_q_prompt = ChatPromptTemplate.from_messages([
         ("system", "Given a chat history and a new question, return a standalone version of the question."),
@@ -89,9 +110,9 @@ Use polite Korean and include emoji.\n\n{context}"""),
     ])
 
     llm = ChatOpenAI(model=selected_model)
-    history_aware_retriever = create_history_aware_retriever(llm, retriever, contextualize_q_prompt)
+    chat_retriever = history_aware_retriever(llm, retriever, contextualize_q_prompt) #첫 질문이거나 질문만으로 뜻이 통하면 재작성 LLM 호출을 건너뜀. 재작성 결과는 (대화 기록 해시, 질문)으로 캐시
     question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
-    rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
+    rag_chain = create_retrieval_chain(chat_retriever, question_answer_chain)
     return rag_chain
 
 # ✅ 대화 메시지 기록 초기화
@@ -129,15 +150,28 @@ if uploaded_file:
     if prompt := st.chat_input("질문을 입력하세요"):
         st.chat_message("human").write(prompt)
         with st.chat_message("ai"):
-            with st.spinner("답변 생성 중..."):
-                config = {"configurable": {"session_id": "upload_session"}}
-                response = conversational_chain.invoke({"input": prompt}, config)
-                answer = response["answer"]
-                st.write(answer)
-
-                with st.expander("🔍 참고한 문서 보기"):
-                    for doc in response.get("context", []):
-                        st.markdown(f"📄 {doc.metadata.get('source', '알 수 없음')}", help=doc.page_content)
+            config = {"configurable": {"session_id": "upload_session"}}
+            answer_box = st.empty() #답변이 들어갈 자리
+            sources_box = st.empty() #참고 문서가 들어갈 자리. 검색이 끝나는 즉시 채움
+            sources_box.caption("🔎 참고 문서 검색 중...")
+            started = time.perf_counter()
+            timing = {}
+
+            def answer_tokens():
+                for chunk in conversational_chain.stream({"input": prompt}, config): #stream: 검색 결과(context)가 먼저 오고, 답변(answer)은 토큰 단위로 옴
+                    if "context" in chunk:
+                        with sources_box.container():
+                            with st.expander("🔍 참고한 문서 보기"):
+                                for doc in chunk["context"]:
+                                    st.markdown(f"📄 {doc.metadata.get('source', '알 수 없음')}", help=doc.page_content)
+                    if chunk.get("answer"):
+                        timing.setdefault("first_token", time.perf_counter() - started) #첫 토큰까지 걸린 시간(TTFT)
+                        yield chunk["answer"]
+
+            with answer_box.container():
+                st.write_stream(answer_tokens()) #토큰이 오는 대로 화면에 출력. 대화 기록에는 전체 답변이 저장됨
+            if "first_token" in timing:
+                st.caption(f"⏱️ 첫 토큰 {timing['first_token']:.2f}초 · 전체 {time.perf_counter() - started:.2f}초")
 
 #LangChain의 conversational_chain을 통해 **PDF 기반 질문 응답(RAG)**을 실행하며,
 #그에 따른 답변과 참고 문서를 Streamlit UI에 보여주는 부분
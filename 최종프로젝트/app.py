@@ -1,9 +1,25 @@
 import streamlit as st
-import fitz  # PyMuPDF
-import openai
-import re
 import os
 import time
+import uuid
+import asyncio
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from chatbot import CHAT_RENDER_TURNS, ChatMemory, ask
+from exam_core import (
+    evaluate_answer_stream, get_hint, get_hint_stream, grade_all, has_reference, read_pdf
+)
+from generation_jobs import generation_stats, get_generation_job
+from llm_backend import LLM_BACKEND, make_async_client, make_client
+from instrumentation import get_recorder
+from llm_cache import get_cache
+from pregrade import get_pregrader
+from pdf_extract import extraction_stats
+from exam_store import get_exam_store
+from problem_bank import get_bank
+from retrieval import PassageIndex
 
 # 페이지 설정
 st.set_page_config(
@@ -12,9 +28,9 @@ st.set_page_config(
     layout="wide"
 )
 
-# OpenAI API 키 읽기 (dotenv, .env 사용 X)
-api_key = st.secrets["OPENAI_API_KEY"]
-client = openai.OpenAI(api_key=api_key)
+# OpenAI API 키 읽기 (dotenv, .env 사용 X). LLM_BACKEND=mock이면 키 없이 가짜 응답을 쓴다
+api_key = st.secrets["OPENAI_API_KEY"] if LLM_BACKEND != "mock" else None
+client = make_client(LLM_BACKEND, api_key)
 
 # UI CSS
 st.markdown("""
@@ -61,95 +77,108 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def extract_text(pdf_file):
-    pdf_file.seek(0)
-    doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
-    texts = [page.get_text().strip() for page in doc]
-    doc.close()
-    return '\n\n'.join(texts)
-
-def generate_questions(full_text, client, num_questions=15, difficulty="중", author_info=None, target_level=None):
-    difficulty_prompts = {
-        "하": "기초적이고 단순한 사실 확인이 아니라, 반드시 학습자가 이해해야 할 핵심 내용을 묻는",
-        "중": "이해력과 적용력을 요구하며, 학습자의 생각을 이끌어내는",
-        "상": "분석력과 종합적 사고, 그리고 비판적 관점을 요구하는"
-    }
-    prompt = (
-        f"너는 {'이 수업의 교수' if not author_info else author_info}이고, "
-        f"이 자료는 {target_level+'용' if target_level else '대상 불명'} 수업 자료다.\n"
-        f"자료의 핵심 개념, 반드시 알아야 할 내용만을 바탕으로 {difficulty_prompts[difficulty]} "
-        f"한국어 주관식 예상 시험문제 {num_questions}개를 만들어줘.\n"
-        f"- 너무 쉬운 문제, 단순 복사 문제, 상식적인 사실 문제는 내지 마라.\n"
-        f"- 학생의 사고력, 이해력, 적용력을 반드시 평가할 수 있어야 한다.\n"
-        f"- 각 문제에 번호를 붙여라 (1. 2. ...)\n"
-        f"- 답은 절대 쓰지 마라.\n"
-        f"- 문제만 작성해라.\n\n"
-        f"자료 내용:\n{full_text}"
-    )
-    response = client.chat.completions.create(
-        model="gpt-4.1",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7
-    )
-    text = response.choices[0].message.content
-    questions = re.findall(r'\d+\.\s(.+)', text)
-    if len(questions) < num_questions:
-        lines = [q.strip() for q in text.split('\n') if q.strip() and not q.startswith('난이도')]
-        questions = []
-        for line in lines:
-            cleaned = re.sub(r'^\d+\.\s*', '', line)
-            if cleaned:
-                questions.append(cleaned)
-        questions = questions[:num_questions]
-    return questions[:num_questions]
-
-def evaluate_answer(question, user_answer, context, client, difficulty="중"):
-    difficulty_criteria = {
-        "하": "기초적인 이해도 중심으로",
-        "중": "이해도와 적용력을 균형있게",
-        "상": "심화된 분석력과 비판적 사고를 중심으로"
-    }
-    context_text = context[:3000]
-    prompt = (
-        f"아래는 난이도 '{difficulty}'의 예상 시험 문제와 이에 대한 학생의 답변입니다.\n\n"
-        f"문제: {question}\n"
-        f"학생의 답변: {user_answer}\n\n"
-        f"참고할 원문 내용:\n{context_text}\n\n"
-        f"{difficulty_criteria[difficulty]} 평가해주세요.\n\n"
-        "다음 형식으로 작성해주세요:\n\n"
-        "**평가 결과**: [정답/부분정답/오답]\n\n"
-        "**모범 답안**:\n[모범 답안 내용]\n\n"
-        "**평가 및 피드백**:\n[구체적인 평가 내용과 개선점]\n\n"
-        "**핵심 포인트**:\n"
-        "- [핵심 내용 1]\n"
-        "- [핵심 내용 2]\n"
-        "- [필요시 추가]\n"
-    )
-    response = client.chat.completions.create(
-        model="gpt-4.1",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.5
-    )
-    return response.choices[0].message.content
-
-def get_hint(question, full_text, client):
-    context_text = full_text[:3000]
-    prompt = (
-        f"아래는 예상 시험문제와 관련된 원문 내용입니다.\n\n"
-        f"문제: {question}\n"
-        f"원문 일부:\n{context_text}\n\n"
-        "문제를 풀 때 참고가 될만한 원문에서 핵심 키워드, 문장, 단서를 간략하게 요약해서 '힌트'로 알려줘. 단, 정답은 포함하지 마."
-    )
-    response = client.chat.completions.create(
-        model="gpt-4.1",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3
-    )
-    return response.choices[0].message.content
+# 호출 위치별 LLM 응답 캐시 사용 여부 (False면 항상 새로 요청)
+CACHE_SITES = {"generate": True, "evaluate": True, "hint": True, "chat": True}
+
+# 힌트 미리 가져오기 설정
+HINT_PREFETCH_AHEAD = 2     # 현재 문제 뒤로 몇 문제까지 미리 가져올지
+HINT_PREFETCH_WORKERS = 2   # 세션당 힌트 작업 스레드 수
+
+PB_PAGE_SIZE = 20           # 문제은행 표 한 페이지에 보여줄 행 수
+GENERATION_POLL_SECONDS = 1 # 나머지 문제 생성 상태를 확인하는 주기(초)
+
+UNANSWERED_EVALUATION = "**평가 결과**: 오답\n\n**평가 및 피드백**:\n답안을 작성하지 않았습니다."
+
+async def _grade_all_with_client(jobs, difficulty, on_result, use_cache):
+    # 비동기 클라이언트는 이벤트 루프마다 새로 만들어야 한다
+    async with make_async_client(LLM_BACKEND, api_key) as aclient:
+        return await grade_all(aclient, jobs, difficulty, on_result, use_cache)
+
+class HintPrefetcher:
+    """세션마다 하나씩 두는 힌트 미리 가져오기 스레드 풀. 문제 번호별 Future를 보관한다."""
+
+    def __init__(self, client, use_cache=True):
+        self.client = client
+        self.use_cache = use_cache
+        self.futures = {}
+        self.executor = ThreadPoolExecutor(max_workers=HINT_PREFETCH_WORKERS, thread_name_prefix="hint")
+        # 세션이 끝나 객체가 버려져도 남은 작업을 정리한다
+        self._finalizer = weakref.finalize(self, self.executor.shutdown, wait=False, cancel_futures=True)
+
+    def prefetch(self, idx, question, context, reference=None):
+        if idx not in self.futures:
+            self.futures[idx] = self.executor.submit(
+                get_hint, question, context, self.client, self.use_cache, reference
+            )
+
+    def get(self, idx):
+        future = self.futures.get(idx)
+        if future is None or future.cancelled():
+            return None
+        return future
+
+    def shutdown(self):
+        self._finalizer()
+
+def prefetch_hints(start):
+    prefetcher = st.session_state.hint_prefetcher
+    if prefetcher is None:
+        return
+    questions = st.session_state.questions
+    for i in range(start, min(start + HINT_PREFETCH_AHEAD + 1, len(questions))):
+        prefetcher.prefetch(i, questions[i], grading_context(i, questions[i]), exam_item(i))
+
+def reset_session():
+    # 진행 중인 힌트 작업을 취소한 뒤 세션을 비운다
+    if st.session_state.get("hint_prefetcher") is not None:
+        st.session_state.hint_prefetcher.shutdown()
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+
+def sync_generated_questions():
+    # 백그라운드 생성 작업에서 새로 완성된 문제를 세션으로 옮긴다. 아직 생성 중이면 True
+    job = st.session_state.generation_job
+    if job is None:
+        return False
+    items, done, error = job.snapshot()
+    for item in items[len(st.session_state.exam_items):]:
+        st.session_state.exam_items.append(item)
+        st.session_state.questions.append(item["question"])
+        st.session_state.user_answers.append("")
+        st.session_state.evaluations.append(None)
+        st.session_state.elapsed_times.append(0)
+    if done:
+        st.session_state.generation_job = None
+        if error is not None and items:
+            st.toast(f"문제 {len(items)}개까지만 생성했습니다: {error}")
+        elif len(items) < st.session_state.num_questions:
+            # 중복 제거 후에도 모자라면 조용히 짧은 시험을 내지 않고 학생에게 알린다
+            st.toast(f"요청한 {st.session_state.num_questions}문제 중 {len(items)}문제만 만들었습니다. 자료에서 서로 다른 문제를 더 만들기 어려웠습니다.")
+    return not done
+
+def retrieve_context(query):
+    # 업로드 때 만든 문단 색인에서 질문과 관련된 부분만 가져온다
+    index = st.session_state.passage_index
+    if index is None:
+        return st.session_state.full_text[:3000]
+    return index.context_for(query)
+
+def exam_item(i):
+    # 생성 때 함께 만든 모범 답안/핵심 포인트/근거 페이지
+    items = st.session_state.exam_items
+    return items[i] if i < len(items) else None
+
+def grading_context(i, query):
+    # 핵심 포인트가 있는 문제는 원문 검색 없이 짧은 프롬프트로 채점/힌트한다
+    if has_reference(exam_item(i)):
+        return ""
+    return retrieve_context(query)
 
 # 세션 상태 초기화
 if "questions" not in st.session_state:
     st.session_state.questions = []
+if "exam_items" not in st.session_state:
+    st.session_state.exam_items = []
 if "question_idx" not in st.session_state:
     st.session_state.question_idx = 0
 if "user_answers" not in st.session_state:
@@ -158,6 +187,14 @@ if "evaluations" not in st.session_state:
     st.session_state.evaluations = []
 if "full_text" not in st.session_state:
     st.session_state.full_text = ""
+if "pages" not in st.session_state:
+    st.session_state.pages = []
+if "doc_hash" not in st.session_state:
+    st.session_state.doc_hash = None
+if "attempt_id" not in st.session_state:
+    st.session_state.attempt_id = None
+if "passage_index" not in st.session_state:
+    st.session_state.passage_index = None
 if "ready" not in st.session_state:
     st.session_state.ready = False
 if "difficulty" not in st.session_state:
@@ -168,14 +205,23 @@ if "start_time" not in st.session_state:
     st.session_state.start_time = None
 if "elapsed_times" not in st.session_state:
     st.session_state.elapsed_times = []
-if "problem_bank" not in st.session_state:
-    st.session_state.problem_bank = []
 if "show_results" not in st.session_state:
     st.session_state.show_results = False
 if "pb_idx" not in st.session_state:
     st.session_state.pb_idx = 1
 if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+    # 화면에는 최근 몇 개만 그리고, 모델에 보낼 대화는 chat_memory가 토큰 예산 안에서 관리한다
+    st.session_state.chat_history = deque(maxlen=CHAT_RENDER_TURNS)
+if "chat_memory" not in st.session_state:
+    st.session_state.chat_memory = ChatMemory()
+if "exam_mode" not in st.session_state:
+    st.session_state.exam_mode = False
+if "hint_prefetcher" not in st.session_state:
+    st.session_state.hint_prefetcher = None
+if "generation_job" not in st.session_state:
+    st.session_state.generation_job = None
+
+sync_generated_questions()
 
 st.title("📚 PDF 기반 AI 시험문제 생성 & 평가 시스템")
 st.markdown("---")
@@ -199,6 +245,10 @@ with st.sidebar:
             step=5
         )
         st.session_state.num_questions = num_questions
+        st.session_state.exam_mode = st.toggle(
+            "시험 모드 (모두 답한 뒤 한 번에 채점)",
+            value=st.session_state.exam_mode
+        )
         st.markdown("---")
         st.info(f"선택된 난이도: **{difficulty}**")
         st.info(f"생성할 문제 수: **{num_questions}개**")
@@ -213,9 +263,22 @@ with st.sidebar:
         st.write(f"답변 작성: {answered}/{total}")
         st.markdown("---")
         st.info(f"현재 난이도: **{st.session_state.difficulty}**")
+        cache_stats = get_cache().stats()
+        st.caption(
+            f"LLM 캐시: 적중 {cache_stats['hits']} / 미스 {cache_stats['misses']} "
+            f"({cache_stats['entries']}건, {cache_stats['bytes'] / 1024:.0f}KB)"
+        )
+        pregrade_stats = get_pregrader().stats()
+        st.caption(
+            f"사전 채점: LLM 호출 {pregrade_stats['avoided']}회 절약 / {pregrade_stats['escalated']}회 LLM 채점"
+        )
+        extract_stats, gen_stats = extraction_stats(), generation_stats()
+        st.caption(
+            f"요청 합치기: 추출 {extract_stats['executed']}회 실행·{extract_stats['coalesced']}회 합침, "
+            f"문제 생성 {gen_stats['started']}회 실행·{gen_stats['coalesced']}회 합침"
+        )
         if st.button("🔄 새로운 시험 시작"):
-            for key in list(st.session_state.keys()):
-                del st.session_state[key]
+            reset_session()
             st.rerun()
 
 col1, col2 = st.columns([2, 1])
@@ -231,22 +294,54 @@ if not st.session_state.ready:
             st.success("✅ 파일 업로드 완료")
             if st.button("🚀 문제 생성 시작", type="primary"):
                 with st.spinner("📖 텍스트 추출 중..."):
-                    full_text = extract_text(uploaded_file)
+                    doc_hash, pages = read_pdf(uploaded_file)
+                full_text = '\n\n'.join(pages)
+                st.session_state.doc_hash = doc_hash
+                # 문제은행은 모든 세션이 함께 쓰므로, 이번 응시에서 쓴 답만 골라 볼 수 있게 응시 id를 붙인다
+                st.session_state.attempt_id = uuid.uuid4().hex
+                st.session_state.pages = pages
                 st.session_state.full_text = full_text
-                with st.spinner(f"🤖 {st.session_state.difficulty} 난이도 문제 {st.session_state.num_questions}개 생성 중..."):
-                    questions = generate_questions(
+                st.session_state.passage_index = PassageIndex(pages)
+                st.session_state.exam_items = []
+                st.session_state.questions = []
+                st.session_state.question_idx = 0
+                st.session_state.user_answers = []
+                st.session_state.evaluations = []
+                st.session_state.elapsed_times = []
+                # pregenerate.py로 미리 만들어 둔 시험이 있으면 생성 없이 바로 불러온다
+                stored = get_exam_store().get(
+                    doc_hash, st.session_state.difficulty, st.session_state.num_questions
+                )
+                if stored:
+                    st.session_state.exam_items = stored
+                    st.session_state.questions = [item["question"] for item in stored]
+                    st.session_state.user_answers = [""] * len(stored)
+                    st.session_state.evaluations = [None] * len(stored)
+                    st.session_state.elapsed_times = [0] * len(stored)
+                else:
+                    # 첫 문제가 나오면 바로 시작하고, 나머지는 백그라운드에서 계속 만든다.
+                    # 같은 파일/옵션으로 동시에 들어온 다른 세션과는 생성 작업 하나를 함께 쓴다
+                    job = get_generation_job(
+                        doc_hash,
                         full_text,
                         client,
                         num_questions=st.session_state.num_questions,
-                        difficulty=st.session_state.difficulty
+                        difficulty=st.session_state.difficulty,
+                        pages=pages,
+                        use_cache=CACHE_SITES["generate"]
                     )
-                st.session_state.questions = questions
-                st.session_state.question_idx = 0
-                st.session_state.user_answers = [""] * len(questions)
-                st.session_state.evaluations = [None] * len(questions)
-                st.session_state.elapsed_times = [0] * len(questions)
+                    with st.spinner(f"🤖 {st.session_state.difficulty} 난이도 문제 {st.session_state.num_questions}개 생성 중..."):
+                        job.wait_first()
+                    st.session_state.generation_job = job
+                    sync_generated_questions()
+                    if not st.session_state.questions:
+                        error = job.snapshot()[2]
+                        st.error(f"문제를 생성하지 못했습니다.{f' ({error})' if error else ''}")
+                        st.stop()
                 st.session_state.ready = True
                 st.session_state.start_time = time.time()
+                st.session_state.hint_prefetcher = HintPrefetcher(client, CACHE_SITES["hint"])
+                prefetch_hints(0)
                 st.balloons()
                 st.rerun()
 
@@ -262,19 +357,60 @@ if st.session_state.ready and st.session_state.questions:
         """, unsafe_allow_html=True
     )
 
+    item = exam_item(idx)
+    page_caption = ""
+    if item and item.get("pages"):
+        first, last = item["pages"]
+        page_caption = f"<p>📄 출처: p.{first}{'' if first == last else f'–{last}'}</p>"
     st.markdown(
         f"""
         <div class="question-box">
             <h3>📝 문제 {idx+1} / {len(questions)}</h3>
             <h4>{questions[idx]}</h4>
+            {page_caption}
         </div>
         """, unsafe_allow_html=True
     )
 
+    @st.fragment(run_every=GENERATION_POLL_SECONDS)
+    def generation_status():
+        # 나머지 문제가 만들어지는 동안 주기적으로 세션에 옮기고 진행 상황을 보여준다
+        if sync_generated_questions():
+            st.caption(
+                f"⏳ 나머지 문제 생성 중... {len(st.session_state.questions)}/{st.session_state.num_questions}개 준비됨"
+            )
+        else:
+            # 생성이 끝나면 앱 전체를 다시 그려 제출 버튼 등 본문의 generating 상태를 갱신하고 폴링을 멈춘다
+            st.rerun(scope="app")
+
+    # 생성 작업이 끝난 뒤에는 fragment를 그리지 않아 매초 다시 실행되지 않는다
+    if st.session_state.generation_job is not None:
+        generation_status()
+
+    # 학생이 답을 쓰는 동안 현재/다음 문제 힌트를 미리 받아 둔다
+    prefetch_hints(idx)
+
     with st.expander("💡 힌트 보기"):
         if st.button("힌트 가져오기", key=f"hint_{idx}"):
-            hint = get_hint(questions[idx], st.session_state.full_text, client)
-            st.info(hint)
+            future = st.session_state.hint_prefetcher.get(idx) if st.session_state.hint_prefetcher else None
+            hint = None
+            if future is not None:
+                try:
+                    with st.spinner("힌트를 준비하고 있습니다..."):
+                        hint = future.result()
+                except Exception:
+                    hint = None
+            if hint:
+                st.info(hint)
+            else:
+                with st.container(border=True):
+                    st.write_stream(get_hint_stream(
+                        questions[idx],
+                        grading_context(idx, questions[idx]),
+                        client,
+                        use_cache=CACHE_SITES["hint"],
+                        reference=item
+                    ))
 
     user_answer = st.text_area(
         "✍️ 답안을 입력하세요:",
@@ -285,15 +421,37 @@ if st.session_state.ready and st.session_state.questions:
     )
 
     col1, col2, col3 = st.columns([1, 2, 1])
+    submitted = False
+    exam_submitted = False
+    generating = st.session_state.generation_job is not None
+
+    def _leave_question():
+        # 시험 모드에서는 다른 문제로 넘어갈 때 답안과 소요 시간을 저장한다
+        st.session_state.user_answers[idx] = user_answer
+        if st.session_state.start_time:
+            st.session_state.elapsed_times[idx] += time.time() - st.session_state.start_time
+        st.session_state.start_time = time.time()
 
     with col1:
         if idx > 0:
             if st.button("◀️ 이전", key=f"prev_{idx}"):
+                if st.session_state.exam_mode:
+                    _leave_question()
                 st.session_state.question_idx = idx - 1
                 st.rerun()
 
     with col2:
-        if st.session_state.evaluations[idx] is None:
+        if st.session_state.exam_mode:
+            if any(ev is None for ev in st.session_state.evaluations):
+                if st.button(
+                    "📤 전체 제출 및 일괄 채점",
+                    key="submit_all",
+                    type="primary",
+                    disabled=generating,
+                    help="문제 생성이 끝나면 제출할 수 있습니다." if generating else None
+                ):
+                    exam_submitted = True
+        elif st.session_state.evaluations[idx] is None:
             submit_disabled = not user_answer.strip()
             if st.button(
                 "📤 답안 제출 및 평가",
@@ -301,42 +459,95 @@ if st.session_state.ready and st.session_state.questions:
                 disabled=submit_disabled,
                 type="primary"
             ):
-                if st.session_state.start_time:
-                    elapsed = time.time() - st.session_state.start_time
-                    st.session_state.elapsed_times[idx] = elapsed
-                with st.spinner("🤖 AI가 답안을 평가하고 있습니다..."):
-                    evaluation = evaluate_answer(
-                        questions[idx],
-                        user_answer,
-                        st.session_state.full_text,
-                        client,
-                        st.session_state.difficulty
-                    )
-                st.session_state.user_answers[idx] = user_answer
-                st.session_state.evaluations[idx] = evaluation
-                entry = {
-                    "문제": questions[idx],
-                    "내 답": user_answer,
-                    "AI 평가": evaluation
-                }
-                if entry not in st.session_state.problem_bank:
-                    st.session_state.problem_bank.append(entry)
-                st.success("✅ 평가 완료!")
-                st.rerun()
+                submitted = True
 
     with col3:
-        if idx < len(questions) - 1:
-            next_disabled = st.session_state.evaluations[idx] is None
+        if idx < len(questions) - 1 or generating:
+            next_disabled = st.session_state.evaluations[idx] is None and not st.session_state.exam_mode
             if st.button("다음 ▶️", key=f"next_{idx}", disabled=next_disabled):
-                st.session_state.question_idx = idx + 1
-                st.session_state.start_time = time.time()
-                st.rerun()
+                # 다음 문제가 아직 생성 중이면 이 문제에 머문다
+                if idx + 1 < len(questions):
+                    if st.session_state.exam_mode:
+                        _leave_question()
+                    st.session_state.question_idx = idx + 1
+                    st.session_state.start_time = time.time()
+                    st.rerun()
+                else:
+                    st.toast("다음 문제를 아직 만들고 있습니다. 잠시 후 다시 눌러 주세요.")
         else:
             if all(ev is not None for ev in st.session_state.evaluations):
                 if st.button("📊 결과 보기", type="primary"):
                     st.session_state.show_results = True
                     st.rerun()
 
+    if submitted:
+        if st.session_state.start_time:
+            elapsed = time.time() - st.session_state.start_time
+            st.session_state.elapsed_times[idx] = elapsed
+        st.markdown("---")
+        st.markdown(
+            """
+            <div class="evaluation-box">
+                <h4>🎯 AI 평가 결과</h4>
+            </div>
+            """, unsafe_allow_html=True
+        )
+        # 평가 내용을 토큰이 오는 대로 보여주고, 끝나면 전체 텍스트를 저장한다
+        evaluation = st.write_stream(evaluate_answer_stream(
+            questions[idx],
+            user_answer,
+            grading_context(idx, f"{questions[idx]}\n{user_answer}"),
+            client,
+            st.session_state.difficulty,
+            use_cache=CACHE_SITES["evaluate"],
+            reference=item
+        ))
+        st.session_state.user_answers[idx] = user_answer
+        st.session_state.evaluations[idx] = evaluation
+        get_bank().add(
+            questions[idx], user_answer, evaluation,
+            doc_hash=st.session_state.doc_hash, difficulty=st.session_state.difficulty,
+            attempt_id=st.session_state.attempt_id
+        )
+        st.success("✅ 평가 완료!")
+        st.rerun()
+
+    if exam_submitted:
+        _leave_question()
+        jobs = []
+        for i, question in enumerate(questions):
+            if st.session_state.evaluations[i] is not None:
+                continue
+            answer = st.session_state.user_answers[i]
+            if not answer.strip():
+                st.session_state.evaluations[i] = UNANSWERED_EVALUATION
+                continue
+            jobs.append((i, question, answer, grading_context(i, f"{question}\n{answer}"), exam_item(i)))
+        grading_progress = st.progress(0.0, text=f"🤖 답안 {len(jobs)}개를 동시에 채점하고 있습니다...")
+        done = []
+
+        def _on_graded(i, evaluation, error):
+            done.append(i)
+            if evaluation is not None:
+                st.session_state.evaluations[i] = evaluation
+                get_bank().add(
+                    questions[i], st.session_state.user_answers[i], evaluation,
+                    doc_hash=st.session_state.doc_hash, difficulty=st.session_state.difficulty,
+                    attempt_id=st.session_state.attempt_id
+                )
+            grading_progress.progress(len(done) / len(jobs), text=f"채점 완료: {len(done)}/{len(jobs)}")
+
+        if jobs:
+            asyncio.run(_grade_all_with_client(
+                jobs, st.session_state.difficulty, _on_graded, CACHE_SITES["evaluate"]
+            ))
+        failed = [i + 1 for i, ev in enumerate(st.session_state.evaluations) if ev is None]
+        if failed:
+            st.warning(f"채점하지 못한 문제가 있습니다: {failed}. 다시 제출해 주세요.")
+        else:
+            st.session_state.show_results = True
+            st.rerun()
+
     if st.session_state.evaluations[idx]:
         st.markdown("---")
         st.markdown(
@@ -366,14 +577,28 @@ if st.session_state.show_results:
     with col3:
         total_time = sum(st.session_state.elapsed_times)
         st.metric("총 소요 시간", f"{int(total_time // 60)}분")
-    if st.session_state.problem_bank:
+    bank = get_bank()
+    col_diff, col_grade = st.columns(2)
+    with col_diff:
+        pb_difficulty = st.selectbox("난이도", ["전체", "하", "중", "상"], key="pb_difficulty")
+    with col_grade:
+        pb_grade = st.selectbox("평가 결과", ["전체", "정답", "부분정답", "오답"], key="pb_grade")
+    # 이번 응시에서 푼 문제만, 선택한 조건으로 걸러서 필요한 만큼만 읽는다
+    pb_filters = {
+        "attempt_id": st.session_state.attempt_id,
+        "doc_hash": st.session_state.doc_hash,
+        "difficulty": None if pb_difficulty == "전체" else pb_difficulty,
+        "grade": None if pb_grade == "전체" else pb_grade,
+    }
+    total_pb = bank.count(**pb_filters)
+    if total_pb:
         st.markdown("## 📚 문제은행 복습")
-        total_pb = len(st.session_state.problem_bank)
+        st.session_state.pb_idx = min(st.session_state.pb_idx, total_pb)
         pb_idx = st.number_input(
             "문제 번호", min_value=1, max_value=total_pb, value=st.session_state.pb_idx, step=1, key="pb_idx_input"
         )
         st.session_state.pb_idx = pb_idx
-        entry = st.session_state.problem_bank[int(pb_idx)-1]
+        entry = bank.page(offset=int(pb_idx) - 1, limit=1, **pb_filters)[0]
         st.markdown(f"**문제 {int(pb_idx)} / {total_pb}**")
         st.markdown(f"**문제:** {entry['문제']}")
         st.markdown(f"**내 답:** {entry['내 답']}")
@@ -391,12 +616,16 @@ if st.session_state.show_results:
                     st.rerun()
         import pandas as pd
         with st.expander("전체 표로 보기 (엑셀로 복사 가능)"):
-            st.dataframe(pd.DataFrame(st.session_state.problem_bank))
+            total_pages = (total_pb - 1) // PB_PAGE_SIZE + 1
+            table_page = st.number_input(
+                f"페이지 (총 {total_pages})", min_value=1, max_value=total_pages, value=1, step=1, key="pb_table_page"
+            )
+            rows = bank.page(offset=(int(table_page) - 1) * PB_PAGE_SIZE, limit=PB_PAGE_SIZE, **pb_filters)
+            st.dataframe(pd.DataFrame(rows))
     else:
         st.info("아직 저장된 문제은행이 없습니다.")
     if st.button("🔄 새로운 시험 시작", type="primary"):
-        for key in list(st.session_state.keys()):
-            del st.session_state[key]
+        reset_session()
         st.rerun()
 
 # ---- 오른쪽 아래 챗봇 ----
@@ -410,19 +639,20 @@ try:
         free_q = st.text_input("궁금한 점을 입력하세요", key="free_q")
         if st.button("질문하기", key="free_q_btn"):
             if free_q:
-                response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[{"role": "user", "content": free_q}],
-                    temperature=0.5
+                answer = ask(
+                    client,
+                    st.session_state.chat_memory,
+                    free_q,
+                    st.session_state.passage_index,
+                    use_cache=CACHE_SITES["chat"]
                 )
-                answer = response.choices[0].message.content
                 st.session_state.chat_history.append((free_q, answer))
                 st.write(f"**Q:** {free_q}")
                 st.write(f"**A:** {answer}")
         if st.session_state.chat_history:
             st.markdown("---")
             st.markdown("##### 최근 질문/답변")
-            for q, a in st.session_state.chat_history[-3:][::-1]:
+            for q, a in reversed(st.session_state.chat_history):
                 st.markdown(f"**Q:** {q}")
                 st.markdown(f"**A:** {a}")
 except Exception:
@@ -432,18 +662,46 @@ except Exception:
         free_q = st.text_input("궁금한 점을 입력하세요", key="free_q_fallback")
         if st.button("질문하기", key="free_q_btn_fallback"):
             if free_q:
-                response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[{"role": "user", "content": free_q}],
-                    temperature=0.5
+                answer = ask(
+                    client,
+                    st.session_state.chat_memory,
+                    free_q,
+                    st.session_state.passage_index,
+                    use_cache=CACHE_SITES["chat"]
                 )
-                answer = response.choices[0].message.content
                 st.session_state.chat_history.append((free_q, answer))
                 st.write(f"**Q:** {free_q}")
                 st.write(f"**A:** {answer}")
         if st.session_state.chat_history:
             st.markdown("---")
             st.markdown("##### 최근 질문/답변")
-            for q, a in st.session_state.chat_history[-3:][::-1]:
+            for q, a in reversed(st.session_state.chat_history):
                 st.markdown(f"**Q:** {q}")
                 st.markdown(f"**A:** {a}")
+
+# ---- 사이드바 LLM 호출 진단 패널 ----
+# 이번 실행에서 일어난 호출까지 보이도록 스크립트 맨 끝에서 그린다
+with st.sidebar:
+    recorder = get_recorder()
+    with st.expander("🔍 LLM 호출 진단"):
+        # 기록기는 모든 세션이 함께 쓰므로, 토글을 실제로 바꾼 세션만 켜고 끈다 (다른 세션의 재실행은 상태를 따라 그리기만 한다)
+        st.session_state.instrumentation_enabled = recorder.enabled
+
+        def _set_recording():
+            recorder.enabled = st.session_state.instrumentation_enabled
+
+        st.toggle("호출 기록", key="instrumentation_enabled", on_change=_set_recording)
+        summary = recorder.summary()
+        if summary:
+            st.dataframe(summary, hide_index=True)
+            st.download_button(
+                "JSONL로 내보내기",
+                data=recorder.to_jsonl(),
+                file_name="llm_calls.jsonl",
+                mime="application/jsonl"
+            )
+            if st.button("기록 지우기", key="instrumentation_clear"):
+                recorder.clear()
+                st.rerun()
+        else:
+            st.caption("아직 기록된 호출이 없습니다.")
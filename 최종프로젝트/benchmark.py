@@ -0,0 +1,208 @@
+"""가짜 LLM 백엔드로 시험 앱의 생성 → 답안 → 평가 흐름을 부하 테스트한다.
+
+    python benchmark.py --sessions 20 --questions 10 --latency 0.5 --error-rate 0.02
+    python benchmark.py --pdf 강의자료.pdf --sessions 40
+"""
+import argparse
+import asyncio
+import hashlib
+import math
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from exam_core import evaluate_answer, generate_questions_stream, get_hint, grade_all, has_reference
+from generation_jobs import generation_stats, get_generation_job
+from llm_backend import AsyncMockLLMClient, MockLLMClient
+from pregrade import get_pregrader
+from retrieval import PassageIndex
+
+SAMPLE_SENTENCES = [
+    "인공지능 서비스는 데이터 수집, 모델 학습, 배포와 모니터링 단계를 거친다.",
+    "검색 증강 생성은 외부 문서를 검색해 언어 모델의 답변 근거로 사용한다.",
+    "임베딩은 문장의 의미를 고정 길이 벡터로 표현하며 유사도 검색에 쓰인다.",
+    "프롬프트 설계는 모델이 원하는 형식과 수준의 답을 내도록 지시하는 과정이다.",
+    "평가 지표는 정확도뿐 아니라 지연 시간과 비용까지 함께 고려해야 한다.",
+]
+
+
+def synthetic_pages(page_count, sentences_per_page=40):
+    return [
+        f"{page_no + 1}장 강의 내용\n" + "\n".join(
+            SAMPLE_SENTENCES[(page_no + i) % len(SAMPLE_SENTENCES)] for i in range(sentences_per_page)
+        )
+        for page_no in range(page_count)
+    ]
+
+
+def percentile(values, pct):
+    """nearest-rank 백분위수."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add_errors(self, stage, count=1):
+        with self._lock:
+            self.errors[stage] += count
+
+    def add_latency(self, stage, seconds):
+        with self._lock:
+            self.latencies[stage].append(seconds)
+
+    def time(self, stage, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            self.add_errors(stage)
+            return None
+        finally:
+            self.add_latency(stage, time.perf_counter() - start)
+
+
+def timed_generation(recorder, *args, **kwargs):
+    # 첫 문제가 나올 때까지(first_q)와 전체 생성(generate) 시간을 따로 잰다
+    start = time.perf_counter()
+    items = []
+    try:
+        for item in generate_questions_stream(*args, **kwargs):
+            if not items:
+                recorder.add_latency("first_q", time.perf_counter() - start)
+            items.append(item)
+    except Exception:
+        recorder.add_errors("generate")
+    recorder.add_latency("generate", time.perf_counter() - start)
+    return items
+
+
+def shared_generation(recorder, doc_hash, full_text, client, num_questions, difficulty, pages, use_cache):
+    # 앱처럼 같은 문서/옵션의 생성 작업을 세션끼리 함께 쓴다
+    start = time.perf_counter()
+    job = get_generation_job(doc_hash, full_text, client, num_questions, difficulty, pages, use_cache)
+    job.wait_first()
+    recorder.add_latency("first_q", time.perf_counter() - start)
+    job.future.result()
+    items, _, error = job.snapshot()
+    if error is not None:
+        recorder.add_errors("generate")
+    recorder.add_latency("generate", time.perf_counter() - start)
+    return items
+
+
+def run_session(session_no, pages, index, args, recorder):
+    client = MockLLMClient(
+        latency=args.latency, tokens_per_sec=args.tokens_per_sec,
+        error_rate=args.error_rate, seed=args.seed + session_no
+    )
+    full_text = '\n\n'.join(pages)
+    if args.coalesce:
+        doc_hash = hashlib.sha256(full_text.encode("utf-8")).hexdigest()
+        items = shared_generation(
+            recorder, doc_hash, full_text, client, args.questions, args.difficulty, pages, args.cache
+        )
+    else:
+        items = timed_generation(
+            recorder, full_text, client,
+            num_questions=args.questions, difficulty=args.difficulty, pages=pages, use_cache=args.cache
+        )
+    # --no-reference면 생성된 모범 답안을 쓰지 않고 원문 검색으로 채점/힌트한다
+    references = [None if args.no_reference else item for item in items]
+    contexts = [
+        "" if has_reference(ref) else index.context_for(item["question"]) for item, ref in zip(items, references)
+    ]
+    answers = []
+    for qi, (item, reference, context) in enumerate(zip(items, references, contexts)):
+        question = item["question"]
+        recorder.time("hint", get_hint, question, context, client, use_cache=args.cache, reference=reference)
+        # 사전 채점에서 걸러지지 않도록 모범 답안(없으면 강의 자료 문장)을 섞은 답안을 쓴다
+        answer = (
+            f"{question[:20]}에 대해 학생 {session_no}이(가) 작성한 답안입니다. "
+            f"{item.get('reference_answer') or SAMPLE_SENTENCES[(session_no + qi) % len(SAMPLE_SENTENCES)]}"
+        )
+        answers.append(answer)
+        if args.mode == "interactive":
+            recorder.time(
+                "evaluate", evaluate_answer, question, answer, context, client, args.difficulty,
+                use_cache=args.cache, reference=reference
+            )
+    if args.mode == "exam" and items:
+        jobs = [
+            (i, item["question"], answer, context, reference)
+            for i, (item, answer, context, reference) in enumerate(zip(items, answers, contexts, references))
+        ]
+        aclient = AsyncMockLLMClient(
+            latency=args.latency, tokens_per_sec=args.tokens_per_sec,
+            error_rate=args.error_rate, seed=args.seed + session_no
+        )
+        results = recorder.time(
+            "grade_all", asyncio.run, grade_all(aclient, jobs, args.difficulty, use_cache=args.cache)
+        ) or []
+        recorder.add_errors("grade_all", sum(1 for _, evaluation, _ in results if evaluation is None))
+
+
+def report(recorder, wall_time):
+    print(f"\n{'stage':<10}{'count':>7}{'errors':>8}{'p50(s)':>9}{'p95(s)':>9}{'p99(s)':>9}{'ops/s':>9}")
+    for stage in ("first_q", "generate", "hint", "evaluate", "grade_all"):
+        values = recorder.latencies.get(stage)
+        if not values:
+            continue
+        print(
+            f"{stage:<10}{len(values):>7}{recorder.errors[stage]:>8}"
+            f"{percentile(values, 50):>9.3f}{percentile(values, 95):>9.3f}{percentile(values, 99):>9.3f}"
+            f"{len(values) / wall_time:>9.2f}"
+        )
+    pregrade_stats = get_pregrader().stats()
+    print(f"\n사전 채점으로 절약한 LLM 호출: {pregrade_stats['avoided']}회 (LLM 채점 {pregrade_stats['escalated']}회)")
+    gen_stats = generation_stats()
+    if gen_stats["started"]:
+        print(f"문제 생성 작업: {gen_stats['started']}회 실행, {gen_stats['coalesced']}회 합침")
+    print(f"총 소요 시간: {wall_time:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 LLM 백엔드로 시험 앱 단계별 지연 시간을 측정합니다.")
+    parser.add_argument("--sessions", type=int, default=10, help="동시에 진행할 가상 세션 수")
+    parser.add_argument("--questions", type=int, default=10, help="세션당 문제 수")
+    parser.add_argument("--difficulty", choices=["하", "중", "상"], default="중")
+    parser.add_argument("--mode", choices=["interactive", "exam"], default="interactive",
+                        help="interactive: 문제마다 채점, exam: 모두 답한 뒤 일괄 채점")
+    parser.add_argument("--pdf", help="합성 문서 대신 사용할 PDF 경로")
+    parser.add_argument("--pages", type=int, default=30, help="합성 문서 페이지 수")
+    parser.add_argument("--latency", type=float, default=0.5, help="첫 토큰까지 지연(초)")
+    parser.add_argument("--tokens-per-sec", type=float, default=60.0, help="출력 토큰 생성 속도")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429 오류 확률")
+    parser.add_argument("--cache", action="store_true", help="LLM 응답 캐시를 켠 상태로 측정")
+    parser.add_argument("--no-reference", action="store_true", help="생성된 모범 답안 없이 원문 검색으로 채점")
+    parser.add_argument("--coalesce", action="store_true", help="같은 문서의 문제 생성을 세션끼리 함께 쓴다")
+    parser.add_argument("--no-pregrade", action="store_true", help="사전 채점 없이 모든 답안을 LLM으로 채점")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    get_pregrader().enabled = not args.no_pregrade
+
+    if args.pdf:
+        from pdf_extract import extract_pages_from_bytes
+        with open(args.pdf, "rb") as f:
+            pages = extract_pages_from_bytes(f.read())[1]
+    else:
+        pages = synthetic_pages(args.pages)
+    index = PassageIndex(pages)
+
+    recorder = Recorder()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        for future in [
+            pool.submit(run_session, i, pages, index, args, recorder) for i in range(args.sessions)
+        ]:
+            future.result()
+    report(recorder, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+from llm_cache import cached_completion
+from retrieval import CHARS_PER_TOKEN, estimate_tokens
+
+# 자유 질문 챗봇 토큰 예산
+CHAT_CONTEXT_TOKENS = 800   # 질문마다 넣을 강의 자료 문단
+CHAT_HISTORY_TOKENS = 600   # 그대로 넣는 최근 대화
+CHAT_SUMMARY_TOKENS = 300   # 오래된 대화를 줄인 요약
+CHAT_RENDER_TURNS = 3       # 화면에 보여줄 최근 질문/답변 수
+
+_SYSTEM_PROMPT = (
+    "너는 학생이 업로드한 강의 자료를 바탕으로 질문에 답하는 조교다. "
+    "주어진 강의 자료와 이전 대화를 근거로 한국어로 간결하게 답하고, "
+    "자료에 없는 내용이면 자료에 없다고 먼저 말한 뒤 일반적인 설명을 덧붙여라."
+)
+
+
+def _turn_tokens(turn):
+    return estimate_tokens(turn[0]) + estimate_tokens(turn[1])
+
+
+def _truncate(text, max_tokens):
+    return text[:int(max_tokens * CHARS_PER_TOKEN)]
+
+
+class ChatMemory:
+    """최근 대화는 그대로, 예산을 넘는 오래된 대화는 요약 한 덩어리로 들고 있는 대화 기억."""
+
+    def __init__(self, history_tokens=CHAT_HISTORY_TOKENS, summary_tokens=CHAT_SUMMARY_TOKENS):
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.turns = []
+
+    def add(self, question, answer, client=None, use_cache=True):
+        self.turns.append((question, answer))
+        self._compact(client, use_cache)
+
+    def _compact(self, client, use_cache):
+        # 최근 대화가 예산을 넘으면 예산의 절반이 될 때까지 오래된 것부터 떼어 요약에 합친다.
+        # 절반까지 줄여 두면 요약 호출이 매 턴이 아니라 몇 턴에 한 번만 일어난다. 마지막 한 턴은 남긴다
+        if sum(_turn_tokens(t) for t in self.turns) <= self.history_tokens:
+            return
+        dropped = []
+        while len(self.turns) > 1 and sum(_turn_tokens(t) for t in self.turns) > self.history_tokens // 2:
+            dropped.append(self.turns.pop(0))
+        if not dropped or client is None:
+            return
+        transcript = '\n'.join(f"학생: {q}\n조교: {a}" for q, a in dropped)
+        summary = cached_completion(
+            client,
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": (
+                f"아래 이전 요약과 대화를 {int(self.summary_tokens * CHARS_PER_TOKEN)}자 이내의 한국어 요약 하나로 합쳐줘. "
+                "학생이 궁금해한 개념과 조교가 설명한 핵심만 남겨라.\n\n"
+                f"이전 요약:\n{self.summary or '(없음)'}\n\n대화:\n{transcript}"
+            )}],
+            temperature=0.2,
+            use_cache=use_cache,
+            site="chat_summary"
+        )
+        self.summary = _truncate(summary or self.summary, self.summary_tokens)
+
+    def messages(self, question, context=""):
+        """시스템 지시, 요약, 최근 대화, 관련 자료, 이번 질문으로 이루어진 메시지 목록."""
+        system = _SYSTEM_PROMPT
+        if self.summary:
+            system += f"\n\n이전 대화 요약:\n{self.summary}"
+        if context:
+            system += f"\n\n강의 자료:\n{context}"
+        messages = [{"role": "system", "content": system}]
+        for q, a in self.turns:
+            messages.append({"role": "user", "content": q})
+            messages.append({"role": "assistant", "content": a})
+        messages.append({"role": "user", "content": question})
+        return messages
+
+
+def ask(client, memory, question, index=None, use_cache=True):
+    """업로드 문서에서 질문과 관련된 문단을 찾아 대화 기억과 함께 물어보고 답을 기억에 더한다."""
+    # "그건 왜 그래요?" 같은 후속 질문도 찾을 수 있게 직전 질문을 검색어에 붙인다
+    query = f"{memory.turns[-1][0]}\n{question}" if memory.turns else question
+    context = index.context_for(query, max_tokens=CHAT_CONTEXT_TOKENS) if index is not None else ""
+    answer = cached_completion(
+        client,
+        model="gpt-4o",
+        messages=memory.messages(question, context),
+        temperature=0.5,
+        use_cache=use_cache,
+        site="chat"
+    )
+    memory.add(question, answer, client, use_cache)
+    return answer
@@ -0,0 +1,538 @@
+import asyncio
+import json
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import openai
+
+from llm_cache import acached_completion, cached_completion, stream_completion
+from pdf_extract import extract_pages_from_bytes
+from pregrade import get_pregrader
+
+# 청크 단위 문제 생성 설정
+CHUNK_CHARS = 12000         # 청크 하나에 넣을 최대 글자 수
+CHUNKED_THRESHOLD = 20000   # 자료가 이보다 길면 청크로 나눠 병렬 생성
+MAX_CONCURRENCY = 8         # 동시에 보낼 생성 요청 수
+DUP_SIMILARITY = 0.6        # 이 이상 겹치는 문제는 중복으로 본다
+GENERATE_MAX_RETRIES = 3    # 청크 생성 요청이 속도 제한/일시 오류로 실패할 때 재시도 횟수
+TOP_UP_ROUNDS = 2           # 중복 제거/형식 오류로 문제가 모자랄 때 더 요청하는 횟수
+
+# 시험 모드 일괄 채점 설정
+GRADE_CONCURRENCY = 5       # 동시에 채점할 답안 수
+GRADE_MAX_RETRIES = 5       # 속도 제한/일시 오류 시 재시도 횟수
+RETRY_BASE_DELAY = 1.0      # 지수 백오프 기본 대기 시간(초)
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)
+
+
+def read_pdf(pdf_file):
+    # (문서 해시, 페이지별 텍스트). 같은 파일은 디스크 캐시에서 바로 읽는다
+    pdf_file.seek(0)
+    return extract_pages_from_bytes(pdf_file.read())
+
+
+def extract_pages(pdf_file):
+    return read_pdf(pdf_file)[1]
+
+
+def extract_text(pdf_file):
+    return '\n\n'.join(extract_pages(pdf_file))
+
+
+def _split_long_text(text, max_chars):
+    # 한 페이지가 max_chars보다 길면 단락 단위로, 그래도 길면 글자 수로 자른다
+    if len(text) <= max_chars:
+        return [text]
+    pieces, buf = [], ""
+    for para in text.split('\n\n'):
+        while len(para) > max_chars:
+            if buf:
+                pieces.append(buf)
+                buf = ""
+            pieces.append(para[:max_chars])
+            para = para[max_chars:]
+        if buf and len(buf) + len(para) + 2 > max_chars:
+            pieces.append(buf)
+            buf = ""
+        buf = f"{buf}\n\n{para}" if buf else para
+    if buf:
+        pieces.append(buf)
+    return pieces
+
+
+def chunk_pages(pages, max_chars=CHUNK_CHARS):
+    """페이지 목록을 max_chars 이하의 청크로 묶는다. 페이지 번호는 1부터 세고, 각 조각 앞에 [p.N]을 붙인다."""
+    chunks = []
+    buf, size, start, end = [], 0, None, None
+    for page_no, text in enumerate(pages, start=1):
+        if not text:
+            continue
+        for piece in _split_long_text(text, max_chars):
+            if buf and size + len(piece) > max_chars:
+                chunks.append({"text": '\n\n'.join(buf), "start_page": start, "end_page": end})
+                buf, size, start = [], 0, None
+            if start is None:
+                start = page_no
+            buf.append(f"[p.{page_no}] {piece}")
+            size += len(piece) + 2
+            end = page_no
+    if buf:
+        chunks.append({"text": '\n\n'.join(buf), "start_page": start, "end_page": end})
+    return chunks
+
+
+def _question_prompt(text, num_questions, difficulty, author_info=None, target_level=None):
+    difficulty_prompts = {
+        "하": "기초적이고 단순한 사실 확인이 아니라, 반드시 학습자가 이해해야 할 핵심 내용을 묻는",
+        "중": "이해력과 적용력을 요구하며, 학습자의 생각을 이끌어내는",
+        "상": "분석력과 종합적 사고, 그리고 비판적 관점을 요구하는"
+    }
+    return (
+        f"너는 {'이 수업의 교수' if not author_info else author_info}이고, "
+        f"이 자료는 {target_level+'용' if target_level else '대상 불명'} 수업 자료다.\n"
+        f"자료의 핵심 개념, 반드시 알아야 할 내용만을 바탕으로 {difficulty_prompts[difficulty]} "
+        f"한국어 주관식 예상 시험문제 {num_questions}개를 만들어줘.\n"
+        f"- 너무 쉬운 문제, 단순 복사 문제, 상식적인 사실 문제는 내지 마라.\n"
+        f"- 학생의 사고력, 이해력, 적용력을 반드시 평가할 수 있어야 한다.\n"
+        f"- 문제 문장에는 답을 절대 쓰지 마라.\n"
+        f"- 문제마다 모범 답안(reference_answer), 채점 핵심 포인트 2~4개(key_points), "
+        f"근거가 된 페이지 범위(pages: [시작, 끝])를 함께 작성해라. 자료의 [p.N]은 페이지 번호다.\n"
+        f"- 아래 JSON 형식으로만 답해라:\n"
+        '{"items": [{"question": "...", "reference_answer": "...", "key_points": ["...", "..."], "pages": [1, 2]}]}\n\n'
+        f"자료 내용:\n{text}"
+    )
+
+
+def _clean_str(value):
+    return value.strip() if isinstance(value, str) else ""
+
+
+def _clean_item(raw, start_page=None, end_page=None):
+    # 문제 객체 하나를 검증한다. 문제 문장이 없으면 None
+    if not isinstance(raw, dict):
+        return None
+    question = _clean_str(raw.get("question"))
+    if not question:
+        return None
+    key_points = raw.get("key_points")
+    if isinstance(key_points, str):
+        key_points = [key_points]
+    key_points = [_clean_str(k) for k in key_points or [] if _clean_str(k)]
+    pages = raw.get("pages")
+    if (isinstance(pages, list) and len(pages) == 2
+            and all(isinstance(p, int) and not isinstance(p, bool) for p in pages)):
+        first, last = sorted(pages)
+    else:
+        first, last = start_page, end_page
+    if start_page is not None and first is not None:
+        first = min(max(first, start_page), end_page)
+        last = min(max(last, first), end_page)
+    return {
+        "question": question,
+        "reference_answer": _clean_str(raw.get("reference_answer")),
+        "key_points": key_points,
+        "pages": [first, last] if first is not None else None,
+    }
+
+
+def parse_exam_items(text, num_questions, start_page=None, end_page=None):
+    """JSON 응답을 검증해 {question, reference_answer, key_points, pages} 목록으로 만든다.
+
+    형식이 맞지 않는 항목은 버리고, 페이지 범위는 청크 범위 안으로 맞춘다.
+    """
+    text = re.sub(r'^```(?:json)?\s*|\s*```$', '', (text or "").strip())
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return []
+    raw_items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(raw_items, list):
+        return []
+    items = [_clean_item(raw, start_page, end_page) for raw in raw_items]
+    return [item for item in items if item][:num_questions]
+
+
+def _request_questions(chunk, client, num_questions, difficulty, author_info=None, target_level=None, use_cache=True):
+    prompt = _question_prompt(chunk["text"], num_questions, difficulty, author_info, target_level)
+    for attempt_cache in (use_cache, False):
+        content = cached_completion(
+            client,
+            model="gpt-4.1",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7,
+            use_cache=attempt_cache,
+            site="generate",
+            response_format={"type": "json_object"}
+        )
+        items = parse_exam_items(content, num_questions, chunk["start_page"], chunk["end_page"])
+        # 형식이 깨진 응답이 캐시에 남아 있을 수 있으니 한 번은 캐시 없이 다시 요청한다
+        if items or not attempt_cache:
+            return items
+    return []
+
+
+def _request_questions_with_retry(chunk, client, num_questions, difficulty, author_info=None, target_level=None, use_cache=True):
+    # 청크 하나의 생성 요청을 _grade_one과 같은 지수 백오프로 재시도한다
+    for attempt in range(GENERATE_MAX_RETRIES):
+        try:
+            return _request_questions(chunk, client, num_questions, difficulty, author_info, target_level, use_cache)
+        except Exception as e:
+            if not is_retryable(e) or attempt == GENERATE_MAX_RETRIES - 1:
+                raise
+            time.sleep(RETRY_BASE_DELAY * 2 ** attempt + random.uniform(0, RETRY_BASE_DELAY))
+
+
+class _ItemStreamParser:
+    """조각조각 도착하는 JSON 응답에서 완성된 문제 객체를 닫히는 대로 꺼낸다."""
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._item_depth = None     # {"items": [...]}이면 2, 배열만 오면 1
+        self._in_string = False
+        self._escape = False
+        self._item_start = None
+
+    def feed(self, delta):
+        self.text += delta
+        found = []
+        for pos in range(self._pos, len(self.text)):
+            ch = self.text[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                if self._item_depth is None:
+                    self._item_depth = 2 if ch == '{' else 1
+                if ch == '{' and self._depth == self._item_depth:
+                    self._item_start = pos
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if ch == '}' and self._depth == self._item_depth and self._item_start is not None:
+                    try:
+                        found.append(json.loads(self.text[self._item_start:pos + 1]))
+                    except ValueError:
+                        pass
+                    self._item_start = None
+        self._pos = len(self.text)
+        return found
+
+
+def _stream_questions(chunk, client, num_questions, difficulty, author_info=None, target_level=None, use_cache=True):
+    # 응답을 스트리밍으로 받으며 문제가 하나 완성될 때마다 바로 내보낸다
+    prompt = _question_prompt(chunk["text"], num_questions, difficulty, author_info, target_level)
+    parser = _ItemStreamParser()
+    count = 0
+    for delta in stream_completion(
+        client,
+        model="gpt-4.1",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.7,
+        use_cache=use_cache,
+        site="generate",
+        response_format={"type": "json_object"}
+    ):
+        for raw in parser.feed(delta):
+            item = _clean_item(raw, chunk["start_page"], chunk["end_page"])
+            if item and count < num_questions:
+                count += 1
+                yield item
+    if count == 0 and use_cache:
+        # 형식이 깨진 응답이 캐시에 남아 있을 수 있으니 한 번은 캐시 없이 다시 요청한다
+        yield from _request_questions(chunk, client, num_questions, difficulty, author_info, target_level, False)
+
+
+def _char_bigrams(text):
+    norm = re.sub(r'[\W_]+', '', text.lower())
+    return {norm[i:i+2] for i in range(len(norm) - 1)} or {norm}
+
+
+def _is_duplicate(question, selected):
+    grams = _char_bigrams(question)
+    for other in selected:
+        other_grams = _char_bigrams(other)
+        overlap = len(grams & other_grams) / max(1, len(grams | other_grams))
+        if overlap >= DUP_SIMILARITY:
+            return True
+    return False
+
+
+def _allocate_questions(chunks, num_questions):
+    # 문서 전체 길이에서 균등한 위치를 골라 그 위치가 속한 청크에 문제를 배정한다
+    total = sum(len(c["text"]) for c in chunks)
+    quotas = [0] * len(chunks)
+    for i in range(num_questions):
+        pos = (i + 0.5) / num_questions * total
+        acc = 0
+        for ci, chunk in enumerate(chunks):
+            acc += len(chunk["text"])
+            if pos < acc or ci == len(chunks) - 1:
+                quotas[ci] += 1
+                break
+    return quotas
+
+
+def generate_questions(full_text, client, num_questions=15, difficulty="중", author_info=None, target_level=None, pages=None, use_cache=True):
+    """문제, 모범 답안, 핵심 포인트, 근거 페이지를 담은 dict 목록을 한 번의 호출(청크당)로 만든다."""
+    return list(generate_questions_stream(
+        full_text, client, num_questions, difficulty, author_info, target_level, pages, use_cache
+    ))
+
+
+def generate_questions_stream(full_text, client, num_questions=15, difficulty="중", author_info=None, target_level=None, pages=None, use_cache=True):
+    """generate_questions와 같은 문제를 완성되는 대로 하나씩 내보내는 제너레이터."""
+    chunks = chunk_pages(pages if pages is not None else [full_text])
+    if not chunks:
+        return
+    if len(full_text) <= CHUNKED_THRESHOLD or len(chunks) <= 1:
+        whole = {
+            "text": '\n\n'.join(c["text"] for c in chunks),
+            "start_page": chunks[0]["start_page"],
+            "end_page": chunks[-1]["end_page"],
+        }
+        yield from _stream_questions(whole, client, num_questions, difficulty, author_info, target_level, use_cache)
+        return
+
+    # map: 배정된 청크마다 (중복 제거용 여유분 1개 포함) 후보 문제를 병렬 생성
+    quotas = _allocate_questions(chunks, num_questions)
+    jobs = [(ci, quota + 1) for ci, quota in enumerate(quotas) if quota > 0]
+    selected, leftovers, errors = [], {}, []
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENCY, len(jobs))) as pool:
+        futures = {
+            pool.submit(
+                _request_questions_with_retry, chunks[ci], client, count, difficulty, author_info, target_level, use_cache
+            ): ci
+            for ci, count in jobs
+        }
+        # reduce: 먼저 끝난 청크부터 배정량만큼 중복 없이 골라 바로 내보낸다
+        for future in as_completed(futures):
+            ci = futures[future]
+            try:
+                items = future.result()
+            except Exception as e:
+                # 재시도해도 실패한 청크는 건너뛰고, 모자란 문제는 아래에서 다른 청크의 여유분으로 채운다
+                errors.append(e)
+                continue
+            taken, rest = 0, []
+            for item in items:
+                if taken < quotas[ci] and not _is_duplicate(item["question"], [it["question"] for it in selected]):
+                    selected.append(item)
+                    taken += 1
+                    yield item
+                else:
+                    rest.append(item)
+            leftovers[ci] = rest
+    if len(errors) == len(jobs):
+        raise errors[0]
+    # 모자라면 다른 청크의 여유분으로 채운다
+    for ci in sorted(leftovers):
+        for item in leftovers[ci]:
+            if len(selected) >= num_questions:
+                return
+            if not _is_duplicate(item["question"], [it["question"] for it in selected]):
+                selected.append(item)
+                yield item
+    # 그래도 모자라면 분량이 큰 청크부터 모자란 수만큼(여유분 1개 포함) 캐시 없이 다시 요청한다
+    by_size = sorted(range(len(chunks)), key=lambda ci: len(chunks[ci]["text"]), reverse=True)
+    for ci in by_size[:TOP_UP_ROUNDS]:
+        missing = num_questions - len(selected)
+        if missing <= 0:
+            return
+        try:
+            items = _request_questions_with_retry(
+                chunks[ci], client, missing + 1, difficulty, author_info, target_level, False
+            )
+        except Exception:
+            continue
+        for item in items:
+            if len(selected) >= num_questions:
+                return
+            if not _is_duplicate(item["question"], [it["question"] for it in selected]):
+                selected.append(item)
+                yield item
+
+
+_DIFFICULTY_CRITERIA = {
+    "하": "기초적인 이해도 중심으로",
+    "중": "이해도와 적용력을 균형있게",
+    "상": "심화된 분석력과 비판적 사고를 중심으로"
+}
+
+
+def has_reference(reference):
+    """생성 때 만든 채점 핵심 포인트가 있는 문제인지. 있으면 채점/힌트에 원문이 필요 없다."""
+    return bool(reference) and bool(reference.get("key_points"))
+
+
+def _bullets(points):
+    return '\n'.join(f"- {p}" for p in points)
+
+
+def _evaluation_prompt(question, user_answer, context, difficulty, reference=None):
+    if has_reference(reference):
+        # 생성 때 만든 모범 답안/핵심 포인트가 있으면 원문 없이 짧은 프롬프트로 채점만 한다
+        return (
+            f"아래는 난이도 '{difficulty}'의 예상 시험 문제, 모범 답안, 채점 핵심 포인트와 학생의 답변입니다.\n\n"
+            f"문제: {question}\n"
+            f"모범 답안: {reference['reference_answer']}\n"
+            f"핵심 포인트:\n{_bullets(reference['key_points'])}\n"
+            f"학생의 답변: {user_answer}\n\n"
+            f"{_DIFFICULTY_CRITERIA[difficulty]} 평가해주세요.\n\n"
+            "다음 형식으로만 작성해주세요:\n\n"
+            "**평가 결과**: [정답/부분정답/오답]\n\n"
+            "**평가 및 피드백**:\n[핵심 포인트를 기준으로 한 구체적인 평가 내용과 개선점]\n"
+        )
+    return (
+        f"아래는 난이도 '{difficulty}'의 예상 시험 문제와 이에 대한 학생의 답변입니다.\n\n"
+        f"문제: {question}\n"
+        f"학생의 답변: {user_answer}\n\n"
+        f"참고할 원문 내용:\n{context}\n\n"
+        f"{_DIFFICULTY_CRITERIA[difficulty]} 평가해주세요.\n\n"
+        "다음 형식으로 작성해주세요:\n\n"
+        "**평가 결과**: [정답/부분정답/오답]\n\n"
+        "**모범 답안**:\n[모범 답안 내용]\n\n"
+        "**평가 및 피드백**:\n[구체적인 평가 내용과 개선점]\n\n"
+        "**핵심 포인트**:\n"
+        "- [핵심 내용 1]\n"
+        "- [핵심 내용 2]\n"
+        "- [필요시 추가]\n"
+    )
+
+
+def _reference_markdown(reference):
+    # 미리 만든 모범 답안/핵심 포인트를 평가 결과 뒤에 원래 형식대로 붙인다
+    if not has_reference(reference):
+        return ""
+    return (
+        f"\n\n**모범 답안**:\n{reference['reference_answer']}"
+        f"\n\n**핵심 포인트**:\n{_bullets(reference['key_points'])}\n"
+    )
+
+
+def pregrade_answer(question, user_answer, context, reference=None):
+    """LLM 없이 오답으로 판정할 수 있는 답안이면 평가 텍스트를, 애매하면 None을 돌려준다."""
+    reason = get_pregrader().check(question, user_answer, reference, context)
+    if reason is None:
+        return None
+    return f"**평가 결과**: 오답\n\n**평가 및 피드백**:\n{reason}" + _reference_markdown(reference)
+
+
+def evaluate_answer(question, user_answer, context, client, difficulty="중", use_cache=True, reference=None):
+    pregraded = pregrade_answer(question, user_answer, context, reference)
+    if pregraded is not None:
+        return pregraded
+    evaluation = cached_completion(
+        client,
+        model="gpt-4.1",
+        messages=[{"role": "user", "content": _evaluation_prompt(question, user_answer, context, difficulty, reference)}],
+        temperature=0.5,
+        use_cache=use_cache,
+        site="evaluate"
+    )
+    return evaluation + _reference_markdown(reference)
+
+
+def evaluate_answer_stream(question, user_answer, context, client, difficulty="중", use_cache=True, reference=None):
+    pregraded = pregrade_answer(question, user_answer, context, reference)
+    if pregraded is not None:
+        yield pregraded
+        return
+    yield from stream_completion(
+        client,
+        model="gpt-4.1",
+        messages=[{"role": "user", "content": _evaluation_prompt(question, user_answer, context, difficulty, reference)}],
+        temperature=0.5,
+        use_cache=use_cache,
+        site="evaluate"
+    )
+    if has_reference(reference):
+        yield _reference_markdown(reference)
+
+
+def _hint_prompt(question, context, reference=None):
+    if has_reference(reference):
+        return (
+            f"문제: {question}\n"
+            f"채점 핵심 포인트:\n{_bullets(reference['key_points'])}\n\n"
+            "위 핵심 포인트를 떠올리는 데 도움이 될 키워드와 단서를 1~2문장의 '힌트'로 알려줘. 단, 정답은 포함하지 마."
+        )
+    return (
+        f"아래는 예상 시험문제와 관련된 원문 내용입니다.\n\n"
+        f"문제: {question}\n"
+        f"원문 일부:\n{context}\n\n"
+        "문제를 풀 때 참고가 될만한 원문에서 핵심 키워드, 문장, 단서를 간략하게 요약해서 '힌트'로 알려줘. 단, 정답은 포함하지 마."
+    )
+
+
+def get_hint(question, context, client, use_cache=True, reference=None):
+    return cached_completion(
+        client,
+        model="gpt-4.1",
+        messages=[{"role": "user", "content": _hint_prompt(question, context, reference)}],
+        temperature=0.3,
+        use_cache=use_cache,
+        site="hint"
+    )
+
+
+def get_hint_stream(question, context, client, use_cache=True, reference=None):
+    return stream_completion(
+        client,
+        model="gpt-4.1",
+        messages=[{"role": "user", "content": _hint_prompt(question, context, reference)}],
+        temperature=0.3,
+        use_cache=use_cache,
+        site="hint"
+    )
+
+
+def is_retryable(error):
+    """속도 제한(429)이나 일시적인 연결 오류면 True. 가짜 백엔드의 오류도 status_code로 판별한다."""
+    return isinstance(error, RETRYABLE_ERRORS) or getattr(error, "status_code", None) == 429
+
+
+async def _grade_one(aclient, semaphore, i, question, user_answer, context, reference, difficulty, use_cache):
+    pregraded = pregrade_answer(question, user_answer, context, reference)
+    if pregraded is not None:
+        return i, pregraded, None
+    async with semaphore:
+        for attempt in range(GRADE_MAX_RETRIES):
+            try:
+                evaluation = await acached_completion(
+                    aclient,
+                    model="gpt-4.1",
+                    messages=[{"role": "user", "content": _evaluation_prompt(question, user_answer, context, difficulty, reference)}],
+                    temperature=0.5,
+                    use_cache=use_cache,
+                    site="grade_all"
+                )
+                return i, evaluation + _reference_markdown(reference), None
+            except Exception as e:
+                if not is_retryable(e) or attempt == GRADE_MAX_RETRIES - 1:
+                    return i, None, e
+                await asyncio.sleep(RETRY_BASE_DELAY * 2 ** attempt + random.uniform(0, RETRY_BASE_DELAY))
+
+
+async def grade_all(aclient, jobs, difficulty="중", on_result=None, use_cache=True):
+    """jobs는 (번호, 문제, 답안, 참고 원문, 모범 답안 dict 또는 None) 목록. 끝나는 순서대로 on_result(번호, 평가, 오류)를 부른다."""
+    semaphore = asyncio.Semaphore(GRADE_CONCURRENCY)
+    tasks = [
+        _grade_one(aclient, semaphore, i, question, user_answer, context, reference, difficulty, use_cache)
+        for i, question, user_answer, context, reference in jobs
+    ]
+    results = []
+    for coro in asyncio.as_completed(tasks):
+        result = await coro
+        results.append(result)
+        if on_result:
+            on_result(*result)
+    return results
@@ -0,0 +1,66 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# 미리 만든 시험 저장 위치 (환경변수로 덮어쓸 수 있음)
+EXAM_STORE_PATH = os.environ.get("EXAM_STORE_PATH", "exam_store.sqlite3")
+
+
+class ExamStore:
+    """(문서 해시, 난이도, 문제 수)마다 미리 생성해 둔 문제 목록을 SQLite에 저장한다."""
+
+    def __init__(self, path=EXAM_STORE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS exams ("
+            " doc_hash TEXT NOT NULL, difficulty TEXT NOT NULL, num_questions INTEGER NOT NULL,"
+            " items TEXT NOT NULL, source TEXT, created_at REAL NOT NULL,"
+            " PRIMARY KEY (doc_hash, difficulty, num_questions))"
+        )
+        self._conn.commit()
+
+    def get(self, doc_hash, difficulty, num_questions):
+        """저장된 문제 dict 목록. 없으면 None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT items FROM exams WHERE doc_hash = ? AND difficulty = ? AND num_questions = ?",
+                (doc_hash, difficulty, num_questions)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def has(self, doc_hash, difficulty, num_questions):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM exams WHERE doc_hash = ? AND difficulty = ? AND num_questions = ?",
+                (doc_hash, difficulty, num_questions)
+            ).fetchone() is not None
+
+    def put(self, doc_hash, difficulty, num_questions, items, source=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO exams VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_hash, difficulty, num_questions, json.dumps(items, ensure_ascii=False), source, time.time())
+            )
+            self._conn.commit()
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM exams").fetchone()[0]
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_exam_store():
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = ExamStore()
+        return _default_store
@@ -0,0 +1,87 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from exam_core import generate_questions_stream
+
+GENERATION_WORKERS = 4      # 프로세스 전체에서 동시에 돌릴 문제 생성 작업 수
+JOB_REUSE_SECONDS = 600     # 끝난 생성 작업을 같은 요청에 다시 나눠 줄 시간(초)
+
+_executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix="generate")
+
+
+class GenerationJob:
+    """백그라운드 스레드에서 문제를 만들며, 완성된 문제를 나오는 대로 items에 쌓는다."""
+
+    def __init__(self, full_text, client, num_questions, difficulty, pages=None, use_cache=True):
+        self.num_questions = num_questions
+        self.finished_at = None
+        self.items = []
+        self.done = False
+        self.error = None
+        self._cond = threading.Condition()
+        self.future = _executor.submit(
+            self._run, full_text, client, num_questions, difficulty, pages, use_cache
+        )
+
+    def _run(self, full_text, client, num_questions, difficulty, pages, use_cache):
+        try:
+            for item in generate_questions_stream(
+                full_text, client, num_questions=num_questions, difficulty=difficulty,
+                pages=pages, use_cache=use_cache
+            ):
+                with self._cond:
+                    self.items.append(item)
+                    self._cond.notify_all()
+        except Exception as e:
+            with self._cond:
+                self.error = e
+        finally:
+            with self._cond:
+                self.done = True
+                self.finished_at = time.time()
+                self._cond.notify_all()
+
+    def wait_first(self, timeout=None):
+        """첫 문제가 나오거나 작업이 끝날 때까지 기다린다."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.items or self.done, timeout)
+
+    def snapshot(self):
+        """(지금까지 나온 문제 목록, 완료 여부, 오류)."""
+        with self._cond:
+            return list(self.items), self.done, self.error
+
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+_job_stats = {"started": 0, "coalesced": 0}
+
+
+def _reusable(job, now):
+    # 진행 중이거나, 최근에 문제를 하나 이상 만들고 끝난 작업만 나눠 쓴다
+    if not job.done:
+        return True
+    return job.error is None and bool(job.items) and now - job.finished_at < JOB_REUSE_SECONDS
+
+
+def get_generation_job(doc_hash, full_text, client, num_questions, difficulty, pages=None, use_cache=True):
+    """(문서 해시, 문제 수, 난이도, 캐시 사용)이 같은 요청은 프로세스 전체에서 생성 작업 하나를 함께 쓴다."""
+    key = (doc_hash, num_questions, difficulty, use_cache)
+    now = time.time()
+    with _jobs_lock:
+        for old_key in [k for k, job in _jobs.items() if not _reusable(job, now)]:
+            del _jobs[old_key]
+        job = _jobs.get(key)
+        if job is not None:
+            _job_stats["coalesced"] += 1
+            return job
+        job = _jobs[key] = GenerationJob(full_text, client, num_questions, difficulty, pages, use_cache)
+        _job_stats["started"] += 1
+        return job
+
+
+def generation_stats():
+    """새로 시작한 생성 작업 수와, 기존 작업에 합쳐진 요청 수."""
+    with _jobs_lock:
+        return {**_job_stats, "active": sum(1 for job in _jobs.values() if not job.done)}
@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# LLM 호출 계측 설정 (환경변수로 덮어쓸 수 있음)
+INSTRUMENTATION_ENABLED = os.environ.get("LLM_INSTRUMENTATION", "1") != "0"
+MAX_RECORDS = 5000          # 메모리에 보관할 최근 호출 기록 수
+
+
+class CallRecorder:
+    """프로세스 전체의 LLM 호출 기록. 꺼져 있으면 record가 바로 반환된다."""
+
+    def __init__(self, enabled=INSTRUMENTATION_ENABLED, max_records=MAX_RECORDS):
+        self.enabled = enabled
+        self.records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def record(self, site, model, latency, prompt_tokens=0, completion_tokens=0, cache="miss", error=None, stream=False):
+        if not self.enabled:
+            return
+        entry = {
+            "ts": time.time(),
+            "site": site or "unknown",
+            "model": model,
+            "latency": round(latency, 4),
+            "prompt_tokens": prompt_tokens or 0,
+            "completion_tokens": completion_tokens or 0,
+            "cache": cache,
+            "stream": stream,
+            "error": error,
+        }
+        with self._lock:
+            self.records.append(entry)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.records)
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+
+    def summary(self):
+        """호출 위치별 호출 수, 오류, 캐시 적중, 토큰, 지연 시간 집계."""
+        groups = {}
+        for entry in self.snapshot():
+            groups.setdefault(entry["site"], []).append(entry)
+        rows = []
+        for site, entries in sorted(groups.items()):
+            latencies = sorted(e["latency"] for e in entries if e["cache"] != "hit")
+            rows.append({
+                "site": site,
+                "calls": len(entries),
+                "errors": sum(1 for e in entries if e["error"]),
+                "cache_hits": sum(1 for e in entries if e["cache"] == "hit"),
+                "prompt_tokens": sum(e["prompt_tokens"] for e in entries),
+                "completion_tokens": sum(e["completion_tokens"] for e in entries),
+                "avg_latency": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+                "p95_latency": latencies[max(0, -(-95 * len(latencies) // 100) - 1)] if latencies else 0.0,
+            })
+        return rows
+
+    def to_jsonl(self):
+        return ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in self.snapshot())
+
+
+_recorder = CallRecorder()
+
+
+def get_recorder():
+    return _recorder
+
+
+def usage_tokens(usage):
+    """response.usage에서 (prompt_tokens, completion_tokens)를 꺼낸다. 없으면 (0, 0)."""
+    if usage is None:
+        return 0, 0
+    return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
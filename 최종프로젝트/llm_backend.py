@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from retrieval import CHARS_PER_TOKEN, estimate_tokens
+
+# LLM 백엔드 선택: "openai"(기본) 또는 "mock"(오프라인 가짜 응답)
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "openai")
+
+# 가짜 백엔드 기본 설정 (환경변수로 덮어쓸 수 있음)
+MOCK_LATENCY = float(os.environ.get("MOCK_LLM_LATENCY", 0.5))              # 첫 토큰까지 걸리는 시간(초)
+MOCK_TOKENS_PER_SEC = float(os.environ.get("MOCK_LLM_TOKENS_PER_SEC", 60))  # 출력 토큰 생성 속도
+MOCK_ERROR_RATE = float(os.environ.get("MOCK_LLM_ERROR_RATE", 0.0))         # 429를 낼 확률
+MOCK_JITTER = 0.2                                                           # 지연 시간의 ±비율
+
+
+class MockRateLimitError(Exception):
+    """가짜 백엔드가 내는 429 오류. openai.RateLimitError처럼 status_code를 가진다."""
+
+    status_code = 429
+
+
+def _words(text):
+    words = list(dict.fromkeys(re.findall(r'[가-힣]{2,}', text)))
+    return words or ["핵심 개념"]
+
+
+def _mock_content(messages):
+    # 프롬프트 종류를 보고 앱이 파싱할 수 있는 형태의 결정적인 응답을 만든다
+    prompt = messages[-1]["content"] if messages else ""
+    seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+    material = prompt.split("자료 내용:", 1)[-1]
+    words = _words(material)
+    pick = lambda i: words[(seed + i * 7) % len(words)]
+
+    match = re.search(r'시험문제 (\d+)개', prompt)
+    if match:
+        page_numbers = [int(n) for n in re.findall(r'\[p\.(\d+)\]', material)] or [1]
+        return json.dumps({"items": [
+            {
+                "question": f"{pick(i)}와(과) {pick(i + 1)}의 관계를 설명하고, 그 의미를 예를 들어 서술하시오.",
+                "reference_answer": f"{pick(i)}은(는) {pick(i + 2)}을(를) 통해 {pick(i + 1)}와(과) 연결된다.",
+                "key_points": [pick(i), pick(i + 1), pick(i + 2)],
+                "pages": [page_numbers[(seed + i) % len(page_numbers)]] * 2,
+            }
+            for i in range(int(match.group(1)))
+        ]}, ensure_ascii=False)
+    if "평가 결과" in prompt:
+        grade = ("정답", "부분정답", "오답")[seed % 3]
+        if "모범 답안:" in prompt:
+            # 모범 답안이 주어진 짧은 채점 프롬프트에는 평가와 피드백만 답한다
+            return (
+                f"**평가 결과**: {grade}\n\n"
+                f"**평가 및 피드백**:\n답안은 {pick(3)}을(를) 언급했지만 {pick(4)}에 대한 설명이 더 필요합니다.\n"
+            )
+        return (
+            f"**평가 결과**: {grade}\n\n"
+            f"**모범 답안**:\n{pick(0)}은(는) {pick(1)}와(과) 밀접하게 관련되며, {pick(2)}의 관점에서 설명할 수 있습니다.\n\n"
+            f"**평가 및 피드백**:\n답안은 {pick(3)}을(를) 언급했지만 {pick(4)}에 대한 설명이 더 필요합니다.\n\n"
+            f"**핵심 포인트**:\n- {pick(5)}\n- {pick(6)}\n"
+        )
+    if "힌트" in prompt:
+        return f"힌트: {pick(0)}, {pick(1)}, {pick(2)}의 관계를 떠올려 보세요."
+    return f"{pick(0)}에 대한 질문이군요. {pick(1)}와(과) {pick(2)}를 중심으로 정리해 보면 이해가 쉽습니다."
+
+
+def _response(model, content, prompt_tokens):
+    usage = SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=estimate_tokens(content),
+        total_tokens=prompt_tokens + estimate_tokens(content)
+    )
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=content), finish_reason="stop")],
+        usage=usage
+    )
+
+
+def _chunk(content=None, usage=None):
+    choices = [] if content is None else [SimpleNamespace(delta=SimpleNamespace(content=content))]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class _MockBase:
+    backend = "mock"    # llm_cache가 캐시 키에 넣어 가짜 응답이 실제 응답 자리에 쓰이지 않게 한다
+
+    def __init__(self, latency=MOCK_LATENCY, tokens_per_sec=MOCK_TOKENS_PER_SEC, error_rate=MOCK_ERROR_RATE,
+                 max_concurrency=None, seed=0):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.max_concurrency = max_concurrency
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def _enter(self):
+        # 오류 확률 또는 동시 요청 한도를 넘으면 429를 낸다
+        with self._lock:
+            if self._rng.random() < self.error_rate:
+                raise MockRateLimitError("mock rate limit")
+            if self.max_concurrency is not None and self._in_flight >= self.max_concurrency:
+                raise MockRateLimitError("mock concurrency limit")
+            self._in_flight += 1
+            return self._rng.uniform(1 - MOCK_JITTER, 1 + MOCK_JITTER)
+
+    def _exit(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _plan(self, messages):
+        content = _mock_content(messages)
+        prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+        return content, prompt_tokens
+
+    def _duration(self, content, jitter):
+        return (self.latency + estimate_tokens(content) / self.tokens_per_sec) * jitter
+
+
+class MockLLMClient(_MockBase):
+    """openai.OpenAI와 같은 모양(client.chat.completions.create)의 오프라인 결정적 백엔드."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, temperature=None, stream=False, stream_options=None, **kwargs):
+        content, prompt_tokens = self._plan(messages)
+        jitter = self._enter()
+        if stream:
+            return self._stream(model, content, prompt_tokens, jitter, stream_options)
+        try:
+            time.sleep(self._duration(content, jitter))
+        finally:
+            self._exit()
+        return _response(model, content, prompt_tokens)
+
+    def _stream(self, model, content, prompt_tokens, jitter, stream_options):
+        try:
+            time.sleep(self.latency * jitter)
+            step = max(1, int(CHARS_PER_TOKEN))
+            for start in range(0, len(content), step):
+                piece = content[start:start + step]
+                time.sleep(estimate_tokens(piece) / self.tokens_per_sec * jitter)
+                yield _chunk(piece)
+            if stream_options and stream_options.get("include_usage"):
+                yield _chunk(usage=_response(model, content, prompt_tokens).usage)
+        finally:
+            self._exit()
+
+
+class AsyncMockLLMClient(_MockBase):
+    """openai.AsyncOpenAI를 흉내 내는 비동기 가짜 백엔드. async with로 쓸 수 있다."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model, messages, temperature=None, **kwargs):
+        content, prompt_tokens = self._plan(messages)
+        jitter = self._enter()
+        try:
+            await asyncio.sleep(self._duration(content, jitter))
+        finally:
+            self._exit()
+        return _response(model, content, prompt_tokens)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def client_backend(client):
+    """클라이언트를 만든 백엔드 이름. OpenAI 클라이언트에는 표시가 없으므로 "openai"."""
+    return getattr(client, "backend", "openai")
+
+
+def make_client(backend=LLM_BACKEND, api_key=None, **mock_options):
+    """설정한 백엔드의 동기 클라이언트. mock이면 OpenAI 키 없이 동작한다."""
+    if backend == "mock":
+        return MockLLMClient(**mock_options)
+    import openai
+    return openai.OpenAI(api_key=api_key)
+
+
+def make_async_client(backend=LLM_BACKEND, api_key=None, **mock_options):
+    """설정한 백엔드의 비동기 클라이언트. 이벤트 루프마다 새로 만들어 async with로 쓴다."""
+    if backend == "mock":
+        return AsyncMockLLMClient(**mock_options)
+    import openai
+    return openai.AsyncOpenAI(api_key=api_key)
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from instrumentation import get_recorder, usage_tokens
+from llm_backend import client_backend
+
+# LLM 응답 캐시 설정 (환경변수로 덮어쓸 수 있음)
+CACHE_PATH = os.environ.get("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite3"))
+CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600))          # 초 단위, 0이면 만료 없음
+CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+
+
+def make_key(model, messages, temperature, response_format=None, backend="openai"):
+    """모델, 프롬프트, temperature(와 출력 형식, 백엔드)로 만든 내용 기반 캐시 키.
+
+    mock 백엔드의 가짜 응답은 다른 키로 저장돼 실제 OpenAI 호출 자리에 쓰이지 않는다.
+    기존 OpenAI 캐시를 그대로 쓰도록 openai일 때는 키에 백엔드를 넣지 않는다.
+    """
+    request = {"model": model, "messages": messages, "temperature": temperature}
+    if response_format is not None:
+        request["response_format"] = response_format
+    if backend != "openai":
+        request["backend"] = backend
+    payload = json.dumps(request, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite에 저장하는 LLM 응답 캐시. TTL 만료와 용량 초과 시 LRU 삭제를 한다."""
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, value TEXT, size INTEGER,"
+            " created_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, model, value):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, value, size, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        if self.ttl:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 가장 오래 안 쓰인 항목부터 용량 상한 아래로 내려갈 때까지 지운다
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total}
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache()
+        return _default_cache
+
+
+def _extra_options(response_format):
+    return {"response_format": response_format} if response_format is not None else {}
+
+
+def cached_completion(client, model, messages, temperature, use_cache=True, site=None, response_format=None):
+    """chat.completions.create 결과 문자열을 캐시를 거쳐 돌려준다. use_cache=False면 캐시를 건너뛴다."""
+    recorder = get_recorder()
+    start = time.perf_counter()
+    if use_cache:
+        cache = get_cache()
+        key = make_key(model, messages, temperature, response_format, client_backend(client))
+        cached = cache.get(key)
+        if cached is not None:
+            recorder.record(site, model, time.perf_counter() - start, cache="hit")
+            return cached
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            **_extra_options(response_format)
+        )
+    except Exception as e:
+        recorder.record(site, model, time.perf_counter() - start, cache="error", error=type(e).__name__)
+        raise
+    text = response.choices[0].message.content
+    recorder.record(
+        site, model, time.perf_counter() - start, *usage_tokens(getattr(response, "usage", None)),
+        cache="miss" if use_cache else "bypass"
+    )
+    if use_cache and text is not None:
+        cache.put(key, model, text)
+    return text
+
+
+def stream_completion(client, model, messages, temperature, use_cache=True, site=None, response_format=None):
+    """응답을 토큰 단위로 내보내는 제너레이터. 캐시에 있으면 한 번에 내보내고, 끝까지 받은 응답만 캐시에 넣는다."""
+    recorder = get_recorder()
+    start = time.perf_counter()
+    if use_cache:
+        cache = get_cache()
+        key = make_key(model, messages, temperature, response_format, client_backend(client))
+        cached = cache.get(key)
+        if cached is not None:
+            recorder.record(site, model, time.perf_counter() - start, cache="hit", stream=True)
+            yield cached
+            return
+    parts, usage = [], None
+    try:
+        stream = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+            **_extra_options(response_format)
+        )
+        for chunk in stream:
+            # 마지막 청크에는 choices 없이 usage만 들어 있다
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+    except Exception as e:
+        recorder.record(site, model, time.perf_counter() - start, cache="error", error=type(e).__name__, stream=True)
+        raise
+    recorder.record(
+        site, model, time.perf_counter() - start, *usage_tokens(usage),
+        cache="miss" if use_cache else "bypass", stream=True
+    )
+    if use_cache and parts:
+        cache.put(key, model, ''.join(parts))
+
+
+async def acached_completion(aclient, model, messages, temperature, use_cache=True, site=None, response_format=None):
+    """cached_completion의 비동기 버전. aclient는 openai.AsyncOpenAI와 같은 인터페이스를 가진다."""
+    recorder = get_recorder()
+    start = time.perf_counter()
+    if use_cache:
+        cache = get_cache()
+        key = make_key(model, messages, temperature, response_format, client_backend(aclient))
+        cached = cache.get(key)
+        if cached is not None:
+            recorder.record(site, model, time.perf_counter() - start, cache="hit")
+            return cached
+    try:
+        response = await aclient.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            **_extra_options(response_format)
+        )
+    except Exception as e:
+        recorder.record(site, model, time.perf_counter() - start, cache="error", error=type(e).__name__)
+        raise
+    text = response.choices[0].message.content
+    recorder.record(
+        site, model, time.perf_counter() - start, *usage_tokens(getattr(response, "usage", None)),
+        cache="miss" if use_cache else "bypass"
+    )
+    if use_cache and text is not None:
+        cache.put(key, model, text)
+    return text
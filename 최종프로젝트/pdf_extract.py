@@ -0,0 +1,100 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+from singleflight import SingleFlight
+
+# PDF 텍스트 추출 설정
+PAGE_CACHE_DIR = os.environ.get("PAGE_CACHE_DIR", os.path.join(".cache", "pages"))
+PARALLEL_MIN_PAGES = 40     # 이보다 페이지가 적으면 프로세스를 띄우지 않고 바로 추출
+PAGES_PER_TASK = 25         # 프로세스 하나가 맡는 페이지 수
+MAX_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+
+# 여러 세션이 같은 파일을 동시에 올리면 추출은 한 번만 한다
+_extract_flight = SingleFlight()
+
+
+def file_digest(data):
+    """업로드 파일 내용의 SHA-256. 추출 캐시와 문서 식별 키로 쓴다."""
+    return hashlib.sha256(data).hexdigest()
+
+
+# 작업 프로세스마다 한 번 연 문서. 페이지 구간마다 PDF 바이트를 다시 보내지 않도록 initializer에서 연다
+_worker_doc = None
+
+
+def _open_worker_doc(data):
+    global _worker_doc
+    _worker_doc = fitz.open(stream=data, filetype="pdf")
+
+
+def _extract_range(start, end):
+    # 작업 프로세스에서 실행된다. 미리 열어 둔 문서에서 [start, end) 페이지만 읽는다
+    return [_worker_doc[i].get_text().strip() for i in range(start, end)]
+
+
+def _cache_path(digest):
+    return os.path.join(PAGE_CACHE_DIR, f"{digest}.json")
+
+
+def _load_cached(digest):
+    try:
+        with open(_cache_path(digest), "r", encoding="utf-8") as f:
+            return json.load(f)["pages"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save_cached(digest, pages):
+    os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{_cache_path(digest)}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"pages": pages}, f, ensure_ascii=False)
+    os.replace(tmp_path, _cache_path(digest))
+
+
+def extract_pages_from_bytes(data, use_cache=True):
+    """PDF 바이트에서 (문서 해시, 페이지별 텍스트 목록)을 돌려준다.
+
+    같은 내용의 파일은 디스크 캐시에서 바로 읽고, 큰 문서는 페이지 구간을 나눠 여러 프로세스에서 추출한다.
+    """
+    digest = file_digest(data)
+    if use_cache:
+        pages = _load_cached(digest)
+        if pages is not None:
+            return digest, pages
+    return digest, _extract_flight.do(digest, _extract_and_save, data, digest, use_cache)
+
+
+def extraction_stats():
+    """추출 실행 횟수와, 진행 중인 추출에 합쳐진 요청 수."""
+    return _extract_flight.stats()
+
+
+def _extract_and_save(data, digest, use_cache):
+    doc = fitz.open(stream=data, filetype="pdf")
+    page_count = doc.page_count
+    if page_count < PARALLEL_MIN_PAGES or MAX_WORKERS <= 1:
+        pages = [page.get_text().strip() for page in doc]
+        doc.close()
+    else:
+        doc.close()
+        ranges = [(start, min(start + PAGES_PER_TASK, page_count)) for start in range(0, page_count, PAGES_PER_TASK)]
+        # Streamlit 서버는 여러 스레드를 쓰므로 fork 대신 spawn으로 작업 프로세스를 띄운다.
+        # PDF 바이트는 작업 프로세스마다 initializer로 한 번만 보내고, 구간 작업에는 페이지 번호만 넘긴다
+        with ProcessPoolExecutor(
+            max_workers=min(MAX_WORKERS, len(ranges)),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_open_worker_doc,
+            initargs=(data,)
+        ) as pool:
+            futures = [pool.submit(_extract_range, start, end) for start, end in ranges]
+            pages = [text for future in futures for text in future.result()]
+
+    if use_cache:
+        _save_cached(digest, pages)
+    return pages
@@ -0,0 +1,92 @@
+"""폴더 안의 PDF들로 난이도/문제 수별 시험을 미리 만들어 exam_store에 저장한다.
+
+    python pregenerate.py 강의자료/ --difficulties 하 중 상 --counts 10 20 --workers 4
+
+이미 저장된 (문서, 난이도, 문제 수) 조합은 건너뛰므로 중간에 멈춰도 다시 실행하면 이어서 진행한다.
+앱에서 같은 PDF를 올리면 저장된 문제를 바로 불러온다.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from exam_core import generate_questions
+from exam_store import get_exam_store
+from llm_backend import LLM_BACKEND, make_client
+from pdf_extract import extract_pages_from_bytes
+
+
+def find_pdfs(directory):
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names if name.lower().endswith(".pdf")
+    )
+
+
+def pregenerate_one(client, path, doc_hash, pages, difficulty, num_questions, use_cache):
+    full_text = '\n\n'.join(pages)
+    items = generate_questions(
+        full_text, client, num_questions=num_questions, difficulty=difficulty, pages=pages, use_cache=use_cache
+    )
+    if not items:
+        raise ValueError("문제를 만들지 못했습니다")
+    get_exam_store().put(doc_hash, difficulty, num_questions, items, source=os.path.basename(path))
+    return len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 폴더로 시험 문제를 미리 생성해 저장합니다.")
+    parser.add_argument("directory", help="PDF가 들어 있는 폴더")
+    parser.add_argument("--difficulties", nargs="+", choices=["하", "중", "상"], default=["하", "중", "상"])
+    parser.add_argument("--counts", nargs="+", type=int, default=[10], help="만들 문제 수 (여러 개 가능)")
+    parser.add_argument("--workers", type=int, default=4, help="동시에 돌릴 생성 작업 수")
+    parser.add_argument("--no-cache", action="store_true", help="LLM 응답 캐시를 쓰지 않음")
+    parser.add_argument("--force", action="store_true", help="이미 저장된 조합도 다시 생성")
+    args = parser.parse_args()
+    # 저장한 시험은 같은 PDF를 올린 학생에게 그대로 나가므로 가짜 응답으로는 만들지 않는다
+    if LLM_BACKEND == "mock":
+        parser.error("LLM_BACKEND=mock으로는 시험을 미리 만들 수 없습니다. 실제 OpenAI 백엔드로 실행하세요.")
+
+    client = make_client(LLM_BACKEND, os.environ.get("OPENAI_API_KEY"))
+    store = get_exam_store()
+
+    # 추출은 문서마다 한 번만 하고(디스크 캐시 사용), 남은 조합만 작업으로 만든다
+    jobs = []
+    skipped = 0
+    for path in find_pdfs(args.directory):
+        with open(path, "rb") as f:
+            doc_hash, pages = extract_pages_from_bytes(f.read())
+        if not any(pages):
+            print(f"건너뜀 (텍스트 없음): {path}")
+            continue
+        for difficulty in args.difficulties:
+            for num_questions in args.counts:
+                if not args.force and store.has(doc_hash, difficulty, num_questions):
+                    skipped += 1
+                    continue
+                jobs.append((path, doc_hash, pages, difficulty, num_questions))
+    print(f"생성할 조합 {len(jobs)}개, 이미 저장됨 {skipped}개")
+
+    done = 0
+    failed = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {
+            pool.submit(pregenerate_one, client, *job, not args.no_cache): job
+            for job in jobs
+        }
+        for future in as_completed(futures):
+            path, _, _, difficulty, num_questions = futures[future]
+            done += 1
+            try:
+                status = f"{future.result()}문제 저장"
+            except Exception as e:
+                failed += 1
+                status = f"실패: {e}"
+            print(f"[{done}/{len(jobs)}] {os.path.basename(path)} 난이도 {difficulty} {num_questions}문제 → {status}")
+    print(f"완료: {len(jobs) - failed}개 성공, {failed}개 실패, {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import re
+import threading
+from collections import Counter
+
+from retrieval import tokenize
+
+# 사전 채점 설정 (환경변수로 덮어쓸 수 있음)
+PREGRADE_ENABLED = os.environ.get("PREGRADE_ENABLED", "1") != "0"
+OFF_TOPIC_OVERLAP = 0.1     # 모범 답안/원문과 겹치는 토큰 비율(정밀도·재현율 중 큰 값)이 이보다 낮으면 무관한 답안
+
+# 답안 전체가 "(잘) 모르겠어요", "기억이 안 나요", "pass" 같은 포기 표현일 때만 맞는다 (부분 일치는 보지 않는다)
+_GIVE_UP_RE = re.compile(
+    r'((잘|정말|진짜|솔직히|전혀|아직|답을?|정답을?|이건|이\s*문제는?)\s*)*'
+    r'(모르겠(어요|습니다|다|네요|음)?|몰라(요)?|모름|모릅니다|'
+    r'(기억|생각)(이)?\s*안\s*(나요|나네요|납니다|남|나)|패스|pass|skip|idk|i\s*don\s*t\s*know)'
+)
+_NOISE_RE = re.compile(r'[\W_ㅋㅎㅠㅜ]+')
+
+
+class PreGrader:
+    """LLM 없이 판정할 수 있는 답안(빈 답, 포기, 무관한 답)을 골라내는 사전 채점기.
+
+    확실한 오답이면 사유 문자열을, 애매하면 None을 돌려줘 LLM 채점으로 넘긴다.
+    """
+
+    def __init__(self, enabled=PREGRADE_ENABLED):
+        self.enabled = enabled
+        self.avoided = 0
+        self.escalated = 0
+        self.reasons = Counter()
+        self._lock = threading.Lock()
+
+    def check(self, question, user_answer, reference=None, context=""):
+        if not self.enabled:
+            return None
+        reason = self._reason(question, user_answer or "", reference, context or "")
+        with self._lock:
+            if reason is None:
+                self.escalated += 1
+            else:
+                self.avoided += 1
+                self.reasons[reason] += 1
+        return reason
+
+    @staticmethod
+    def _reason(question, user_answer, reference, context):
+        answer = user_answer.strip()
+        # 짧아도 "5년 단임"처럼 맞는 답일 수 있으므로, 글자/숫자가 하나도 없는 답안만 빈 답으로 본다
+        if not tokenize(answer):
+            return "답안이 비어 있어 평가할 내용이 없습니다."
+        if _GIVE_UP_RE.fullmatch(_NOISE_RE.sub(' ', answer.lower()).strip()):
+            return "답을 모른다고 작성했습니다."
+        # 문제를 그대로 옮겨 쓴 부분은 빼고, 남은 토큰이 모범 답안(없으면 원문)과 얼마나 겹치는지 본다
+        if reference and reference.get("key_points"):
+            source = ' '.join([reference.get("reference_answer", "")] + reference["key_points"])
+        else:
+            source = context
+        if not source:
+            return None
+        question_tokens = set(tokenize(question))
+        answer_tokens = set(tokenize(answer)) - question_tokens
+        if not answer_tokens:
+            return "문제를 다시 적었을 뿐 답에 해당하는 내용이 없습니다."
+        source_tokens = set(tokenize(source)) - question_tokens
+        shared = len(answer_tokens & source_tokens)
+        # 답안이 길어 정밀도가 낮아도 모범 답안 내용을 일부 담았으면(재현율) LLM에 넘긴다
+        overlap = max(shared / len(answer_tokens), shared / max(1, len(source_tokens)))
+        if overlap < OFF_TOPIC_OVERLAP:
+            return "답안이 문제와 관련된 내용을 다루지 않습니다."
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {"avoided": self.avoided, "escalated": self.escalated, "reasons": dict(self.reasons)}
+
+    def reset(self):
+        with self._lock:
+            self.avoided = 0
+            self.escalated = 0
+            self.reasons.clear()
+
+
+_pregrader = PreGrader()
+
+
+def get_pregrader():
+    return _pregrader
@@ -0,0 +1,105 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# 문제은행 저장 위치 (환경변수로 덮어쓸 수 있음)
+BANK_PATH = os.environ.get("PROBLEM_BANK_PATH", "problem_bank.sqlite3")
+
+_GRADE_RE = re.compile(r'평가 결과\**\s*[:：]\s*\[?\s*(부분정답|정답|오답)')
+
+
+def entry_key(question, answer, attempt_id=None):
+    """응시(attempt)별 문제/답안 쌍의 고유 키. 다른 학생이 같은 답을 써도 각자의 기록으로 남는다."""
+    return hashlib.sha256(f"{attempt_id or ''}\0{question}\0{answer}".encode("utf-8")).hexdigest()
+
+
+def parse_grade(evaluation):
+    """평가 텍스트의 '**평가 결과**: …' 줄에서 정답/부분정답/오답을 뽑는다."""
+    match = _GRADE_RE.search(evaluation or "")
+    return match.group(1) if match else None
+
+
+class ProblemBank:
+    """SQLite에 저장하는 문제은행. 세션이 끝나도 남고, 응시/문서/난이도/평가 결과로 걸러 페이지 단위로 읽는다."""
+
+    def __init__(self, path=BANK_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS problems ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " entry_key TEXT NOT NULL UNIQUE,"
+            " doc_hash TEXT, difficulty TEXT, grade TEXT,"
+            " question TEXT NOT NULL, answer TEXT NOT NULL, evaluation TEXT,"
+            " created_at REAL NOT NULL, attempt_id TEXT);"
+            "CREATE INDEX IF NOT EXISTS idx_problems_doc ON problems(doc_hash, id);"
+            "CREATE INDEX IF NOT EXISTS idx_problems_difficulty ON problems(difficulty);"
+            "CREATE INDEX IF NOT EXISTS idx_problems_grade ON problems(grade);"
+        )
+        # attempt_id 열이 없던 예전 파일은 열을 덧붙인다 (예전 기록은 어느 응시에도 속하지 않는다)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(problems)")}
+        if "attempt_id" not in columns:
+            self._conn.execute("ALTER TABLE problems ADD COLUMN attempt_id TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_problems_attempt ON problems(attempt_id, id)")
+        self._conn.commit()
+
+    def add(self, question, answer, evaluation, doc_hash=None, difficulty=None, attempt_id=None):
+        """새 문제/답안이면 저장하고 True, 이 응시에서 이미 저장했으면 False를 돌려준다."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO problems"
+                " (entry_key, doc_hash, difficulty, grade, question, answer, evaluation, created_at, attempt_id)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (entry_key(question, answer, attempt_id), doc_hash, difficulty, parse_grade(evaluation),
+                 question, answer, evaluation, time.time(), attempt_id)
+            )
+            self._conn.commit()
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def _where(attempt_id=None, doc_hash=None, difficulty=None, grade=None):
+        clauses, params = [], []
+        for column, value in (
+            ("attempt_id", attempt_id), ("doc_hash", doc_hash), ("difficulty", difficulty), ("grade", grade)
+        ):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def count(self, attempt_id=None, doc_hash=None, difficulty=None, grade=None):
+        where, params = self._where(attempt_id, doc_hash, difficulty, grade)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM problems{where}", params).fetchone()[0]
+
+    def page(self, offset=0, limit=20, attempt_id=None, doc_hash=None, difficulty=None, grade=None):
+        """저장된 순서대로 offset부터 limit개를 화면 표시용 dict 목록으로 돌려준다."""
+        where, params = self._where(attempt_id, doc_hash, difficulty, grade)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT question, answer, evaluation, difficulty, grade FROM problems{where}"
+                " ORDER BY id LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [
+            {"문제": q, "내 답": a, "AI 평가": ev, "난이도": diff, "평가 결과": grade}
+            for q, a, ev, diff, grade in rows
+        ]
+
+
+_default_bank = None
+_default_lock = threading.Lock()
+
+
+def get_bank():
+    global _default_bank
+    with _default_lock:
+        if _default_bank is None:
+            _default_bank = ProblemBank()
+        return _default_bank
@@ -0,0 +1,106 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+# 문단 검색 설정
+PASSAGE_CHARS = 600       # 문단 하나의 목표 글자 수
+CONTEXT_TOKENS = 1200     # 프롬프트에 넣을 참고 문단의 토큰 예산
+CHARS_PER_TOKEN = 1.5     # 한국어 기준 대략적인 글자/토큰 비율
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_HANGUL_RE = re.compile(r'[가-힣]+')
+_WORD_RE = re.compile(r'[가-힣]+|[a-zA-Z]+|\d+')
+
+
+def estimate_tokens(text):
+    """tiktoken 없이 쓰는 대략적인 토큰 수 추정."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def tokenize(text):
+    """한글은 형태소 분석기 대신 글자 2-gram, 영문/숫자는 단어 단위로 자른다."""
+    tokens = []
+    for word in _WORD_RE.findall(text.lower()):
+        if _HANGUL_RE.fullmatch(word) and len(word) > 1:
+            tokens.extend(word[i:i+2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def split_passages(pages, max_chars=PASSAGE_CHARS):
+    """페이지 텍스트를 문단 단위로 묶어 max_chars 안팎의 검색 단위로 만든다."""
+    passages = []
+    for page_no, text in enumerate(pages, start=1):
+        buf = ""
+        for para in re.split(r'\n\s*\n|\n', text):
+            para = para.strip()
+            if not para:
+                continue
+            if buf and len(buf) + len(para) + 1 > max_chars:
+                passages.append({"text": buf, "page": page_no})
+                buf = ""
+            buf = f"{buf}\n{para}" if buf else para
+            while len(buf) > max_chars * 2:
+                passages.append({"text": buf[:max_chars], "page": page_no})
+                buf = buf[max_chars:]
+        if buf:
+            passages.append({"text": buf, "page": page_no})
+    return passages
+
+
+class PassageIndex:
+    """업로드된 문서에 대해 한 번 만들어 두는 BM25 역색인. 네트워크가 필요 없다."""
+
+    def __init__(self, pages):
+        self.passages = split_passages(pages)
+        self.postings = defaultdict(list)
+        self.lengths = []
+        for pid, passage in enumerate(self.passages):
+            counts = Counter(tokenize(passage["text"]))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((pid, tf))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+    def __len__(self):
+        return len(self.passages)
+
+    def search(self, query, k=5):
+        """(점수, 문단 번호) 목록을 점수 높은 순으로 돌려준다."""
+        n = len(self.passages)
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for pid, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[pid] / self.avg_length)
+                scores[pid] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(score, pid) for pid, score in ranked[:k]]
+
+    def context_for(self, query, max_tokens=CONTEXT_TOKENS):
+        """질문과 관련된 문단을 토큰 예산 안에서 골라 페이지 순서대로 이어 붙인다."""
+        chosen, used = [], 0
+        for _, pid in self.search(query, k=len(self.passages)):
+            cost = estimate_tokens(self.passages[pid]["text"])
+            if used + cost > max_tokens:
+                if chosen:
+                    break
+                continue
+            chosen.append(pid)
+            used += cost
+        if not chosen and self.passages:
+            # 겹치는 단어가 하나도 없으면 문서 앞부분을 예산만큼 쓴다
+            for pid, passage in enumerate(self.passages):
+                cost = estimate_tokens(passage["text"])
+                if used + cost > max_tokens:
+                    break
+                chosen.append(pid)
+                used += cost
+        return '\n\n'.join(
+            f"[p.{self.passages[pid]['page']}] {self.passages[pid]['text']}" for pid in sorted(chosen)
+        )